@@ -1,10 +1,14 @@
 import streamlit as st
-import pandas as pd
+from collections import Counter
+from collections.abc import Sequence
 from datetime import datetime
 import time
-from sentiment_analyzer import SentimentAnalyzer
+from sentiment_analyzer import SentimentAnalyzer, SummaryAccumulator
 from chart_generator import ChartGenerator
-from data_processor import DataProcessor
+from data_processor import DataProcessor, ResultSpool, TextStream
+
+# Streamed jobs keep this many results for charts and tables; the summary covers all
+MAX_DISPLAY_RESULTS = 10000
 
 # Page configuration
 st.set_page_config(
@@ -25,7 +29,36 @@ def load_chart_generator():
 def load_data_processor():
     return DataProcessor()
 
+def is_line_index(texts):
+    """True for a LineIndex, checked by its interface so only stream_txt imports line_index"""
+    return isinstance(texts, Sequence) and hasattr(texts, 'progress')
+
+def release_streamed_upload():
+    """Close the stream opened for the previous upload, deleting any temporary copy"""
+    cached = st.session_state.pop('streamed_upload', None)
+    if cached is not None and hasattr(cached[1], 'close'):
+        cached[1].close()
+
+def load_streamed_upload(data_processor, uploaded_file, text_column, key_path):
+    """Open a large upload once and reuse it on every rerun until the upload changes
+    
+    Indexing a text file copies and scans all of it, too slow to repeat each
+    time a widget changes.
+    """
+    key = (getattr(uploaded_file, 'file_id', uploaded_file.name), text_column, key_path)
+    cached = st.session_state.get('streamed_upload')
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    
+    release_streamed_upload()
+    stream = data_processor.stream_uploaded_file(uploaded_file, text_column, key_path)
+    st.session_state.streamed_upload = (key, stream)
+    return stream
+
 def main():
+    # Loaded on first render instead of at module import
+    import pandas as pd
+    
     st.title("📊 AI Sentiment Analysis Dashboard")
     st.markdown("**Analyze emotions in text using AI - Upload files or enter text directly**")
     
@@ -43,7 +76,7 @@ def main():
         st.header("🎯 How It Works")
         st.markdown("""
         **1. Input Data**
-        - Upload CSV, TXT, or JSON files
+        - Upload CSV, TXT, JSON, or JSONL files
         - Or enter text directly
         
         **2. AI Analysis**
@@ -62,10 +95,24 @@ def main():
         - **CSV**: Text in columns
         - **TXT**: Line-separated text
         - **JSON**: Text in objects
+        - **JSONL / NDJSON**: One JSON object per line
         """)
         
         if st.button("🧪 Load Sample Data"):
             st.session_state.sample_data = True
+        
+        st.header("⚙️ Analysis Settings")
+        use_cascade = st.checkbox(
+            "Local-first cascade",
+            help="Score texts locally first and only send uncertain ones to Gemini"
+        )
+        cascade_threshold = None
+        if use_cascade:
+            cascade_threshold = st.slider(
+                "Local confidence margin:",
+                0.0, 1.0, 0.7, 0.05,
+                help="Texts with a local margin at or above this value skip Gemini"
+            )
     
     # Main content tabs
     tab1, tab2, tab3 = st.tabs(["📝 Input & Analysis", "📊 Results Dashboard", "📁 Export & Reports"])
@@ -85,30 +132,74 @@ def main():
         if input_method == "Upload File":
             uploaded_file = st.file_uploader(
                 "Upload your file",
-                type=['csv', 'txt', 'json'],
-                help="Upload CSV, TXT, or JSON files containing text to analyze"
+                type=['csv', 'txt', 'json', 'jsonl', 'ndjson'],
+                help="Upload CSV, TXT, JSON, or JSONL files containing text to analyze"
             )
             
+            text_column = None
+            if uploaded_file and uploaded_file.name.lower().endswith('.csv'):
+                text_column = st.text_input(
+                    "CSV text column (optional):",
+                    help="Leave empty to detect the text column from a sample of rows"
+                ).strip() or None
+            
+            key_path = None
+            if uploaded_file and uploaded_file.name.lower().endswith(('.json', '.jsonl', '.ndjson')):
+                key_path = st.text_input(
+                    "JSON key path (optional):",
+                    help="Dotted path to the text field, e.g. payload.message; in a .json file, * steps into a "
+                         "nested list, e.g. reviews.*.text. Leave empty to use the first long string field"
+                ).strip() or None
+            
+            if not uploaded_file:
+                release_streamed_upload()
+            
             if uploaded_file:
                 try:
                     with st.spinner("Processing file..."):
-                        processed_data = data_processor.process_uploaded_file(uploaded_file)
-                        texts_to_analyze = processed_data['texts']
-                        metadata = processed_data['metadata']
+                        if data_processor.should_stream(uploaded_file):
+                            # Large uploads are read in chunks during analysis instead of up front
+                            texts_to_analyze = load_streamed_upload(data_processor, uploaded_file, text_column, key_path)
+                            metadata = texts_to_analyze.metadata
+                            preview_texts = texts_to_analyze.head(5)
+                        else:
+                            release_streamed_upload()
+                            processed_data = data_processor.process_uploaded_file(uploaded_file, text_column, key_path)
+                            texts_to_analyze = processed_data['texts']
+                            metadata = processed_data['metadata']
+                            preview_texts = texts_to_analyze[:5]
                     
-                    st.success(f"✅ Processed {len(texts_to_analyze)} texts from {metadata['source']}")
+                    if is_line_index(texts_to_analyze):
+                        st.success(
+                            f"✅ Indexed {len(texts_to_analyze)} lines from {metadata['source']}; "
+                            "lines are read from disk as they are analyzed"
+                        )
+                    elif isinstance(texts_to_analyze, TextStream):
+                        st.success(
+                            f"✅ Streaming {uploaded_file.size / (1024 * 1024):.0f} MB from {metadata['source']}; "
+                            "texts are read in chunks during analysis"
+                        )
+                    else:
+                        st.success(f"✅ Processed {len(texts_to_analyze)} texts from {metadata['source']}")
                     
                     # Show preview
-                    if texts_to_analyze:
+                    if preview_texts:
                         st.subheader("📋 Preview")
                         preview_df = pd.DataFrame({
                             'Text Preview': [text[:100] + "..." if len(text) > 100 else text 
-                                           for text in texts_to_analyze[:5]]
+                                           for text in preview_texts]
                         })
                         st.dataframe(preview_df)
                         
-                        if len(texts_to_analyze) > 5:
+                        if not isinstance(texts_to_analyze, TextStream) and len(texts_to_analyze) > 5:
                             st.info(f"Showing first 5 of {len(texts_to_analyze)} texts")
+                        
+                        if is_line_index(texts_to_analyze) and len(texts_to_analyze) > 5:
+                            # Any line can be read from the index without loading the file
+                            line_number = st.number_input(
+                                "Show line:", min_value=1, max_value=len(texts_to_analyze), value=1
+                            )
+                            st.text(texts_to_analyze[int(line_number) - 1])
                 
                 except Exception as e:
                     st.error(f"❌ Error processing file: {e}")
@@ -141,13 +232,19 @@ def main():
         
         # Analysis button
         if texts_to_analyze:
+            streaming = isinstance(texts_to_analyze, TextStream) or is_line_index(texts_to_analyze)
             col1, col2 = st.columns([1, 3])
             
             with col1:
                 analyze_button = st.button("🚀 Analyze Sentiment", type="primary")
             
             with col2:
-                st.info(f"Ready to analyze {len(texts_to_analyze)} texts")
+                if is_line_index(texts_to_analyze):
+                    st.info(f"Ready to analyze {len(texts_to_analyze)} lines in streamed chunks")
+                elif streaming:
+                    st.info("Ready to analyze the whole file in streamed chunks")
+                else:
+                    st.info(f"Ready to analyze {len(texts_to_analyze)} texts")
             
             if analyze_button:
                 # Perform analysis
@@ -157,34 +254,109 @@ def main():
                     
                     start_time = time.time()
                     
-                    if len(texts_to_analyze) == 1:
+                    if streaming:
+                        # Only a window of texts is in memory at once; the summary is kept running
+                        status_text.text("Streaming analysis...")
+                        accumulator = SummaryAccumulator()
+                        # Every result goes to disk for the exports; only the first few are kept for charts
+                        all_results = ResultSpool()
+                        results = []
+                        for result in analyzer.analyze_stream(texts_to_analyze, cascade_threshold=cascade_threshold):
+                            accumulator.add(result)
+                            all_results.append(result)
+                            if len(results) < MAX_DISPLAY_RESULTS:
+                                results.append(result)
+                            if accumulator.total % 1000 == 0:
+                                progress_bar.progress(texts_to_analyze.progress)
+                                status_text.text(f"Analyzed {accumulator.total} texts...")
+                        progress_bar.progress(1.0)
+                        summary_stats = accumulator.summary()
+                        metadata = texts_to_analyze.metadata
+                    elif len(texts_to_analyze) == 1:
                         # Single text analysis
                         status_text.text("Analyzing text...")
-                        results = [analyzer.analyze_single_text(texts_to_analyze[0])]
+                        results = [analyzer.analyze_single_text(texts_to_analyze[0], cascade_threshold=cascade_threshold)]
                         progress_bar.progress(1.0)
                     else:
-                        # Batch analysis
+                        # Batch analysis, streamed so progress moves as each item arrives
                         status_text.text("Analyzing batch...")
-                        results = analyzer.analyze_batch(texts_to_analyze)
+                        total = len(texts_to_analyze)
+                        streamed = Counter()
+                        
+                        def show_progress(index, result):
+                            streamed[result['sentiment']] += 1
+                            done = sum(streamed.values())
+                            # Redraw about once per percent rather than per item
+                            if done < total and done % max(1, total // 100):
+                                return
+                            progress_bar.progress(done / total)
+                            status_text.text(
+                                f"Analyzed {done}/{total} texts — "
+                                f"😊 {streamed['positive']} · 😐 {streamed['neutral']} · 😞 {streamed['negative']}"
+                            )
+                        
+                        results = analyzer.analyze_batch(
+                            texts_to_analyze, cascade_threshold=cascade_threshold, on_result=show_progress
+                        )
                         progress_bar.progress(1.0)
                     
                     # Calculate summary statistics
-                    summary_stats = analyzer.get_summary_stats(results)
+                    if not streaming:
+                        summary_stats = analyzer.get_summary_stats(results)
                     
                     end_time = time.time()
                     analysis_time = round(end_time - start_time, 2)
                     
-                    # Store results in session state
-                    st.session_state.analysis_results = results
-                    st.session_state.summary_stats = summary_stats
-                    st.session_state.metadata = metadata
-                    st.session_state.analysis_time = analysis_time
+                    # A stream can yield nothing, e.g. when the key path matches no field
+                    if summary_stats:
+                        # Store results in session state
+                        previous_results = st.session_state.get('all_results')
+                        if previous_results is not None:
+                            previous_results.close()
+                        st.session_state.analysis_results = results
+                        st.session_state.all_results = all_results if streaming else None
+                        st.session_state.exports = {}
+                        st.session_state.summary_stats = summary_stats
+                        st.session_state.metadata = metadata
+                        st.session_state.analysis_time = analysis_time
+                    elif streaming:
+                        all_results.close()
                     
                     status_text.empty()
                     progress_bar.empty()
                 
-                st.success(f"✅ Analysis complete! Processed {len(results)} texts in {analysis_time}s")
-                st.balloons()
+                if not summary_stats:
+                    st.error("❌ No texts were found in the file; check the text column or JSON key path")
+                else:
+                    st.success(
+                        f"✅ Analysis complete! Processed {summary_stats.get('total_analyzed', 0)} texts in {analysis_time}s"
+                    )
+                    if len(results) < summary_stats.get('total_analyzed', 0):
+                        st.caption(
+                            f"📉 Charts and tables show the first {len(results)} results; "
+                            "the summary covers every text"
+                        )
+                    
+                    tier_percentages = st.session_state.summary_stats.get('tier_percentages', {})
+                    if tier_percentages:
+                        st.caption("🧭 Served by: " + ", ".join(
+                            f"{tier} {percentage}%" for tier, percentage in sorted(tier_percentages.items())
+                        ))
+                    
+                    near_duplicate_stats = analyzer.get_near_duplicate_stats()
+                    if near_duplicate_stats:
+                        st.caption(
+                            f"🪞 Near-duplicate reuse: {tier_percentages.get('near_duplicate', 0)}% of this job "
+                            f"(similarity ≥ {near_duplicate_stats['threshold']})"
+                        )
+                    
+                    cache_stats = analyzer.get_cache_stats()
+                    if cache_stats:
+                        st.caption(
+                            f"💾 Result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                            f"({cache_stats['hit_rate'] * 100:.0f}% hit rate since startup)"
+                        )
+                    st.balloons()
     
     with tab2:
         st.header("📊 Analysis Results Dashboard")
@@ -330,6 +502,11 @@ def main():
             results = st.session_state.analysis_results
             summary_stats = st.session_state.summary_stats
             metadata = st.session_state.metadata
+            # Streamed jobs export every result from disk, not just the ones kept for charts
+            export_results = st.session_state.get('all_results')
+            if export_results is None:
+                export_results = results
+            exports = st.session_state.setdefault('exports', {})
             
             # Export options
             st.subheader("💾 Export Results")
@@ -338,7 +515,9 @@ def main():
             
             with col1:
                 # CSV Export
-                csv_data = data_processor.export_results_csv(results, summary_stats)
+                if 'csv' not in exports:
+                    exports['csv'] = data_processor.export_results_csv(export_results, summary_stats)
+                csv_data = exports['csv']
                 st.download_button(
                     label="📄 Download CSV Report",
                     data=csv_data,
@@ -348,7 +527,9 @@ def main():
             
             with col2:
                 # JSON Export
-                json_data = data_processor.export_results_json(results, summary_stats)
+                if 'json' not in exports:
+                    exports['json'] = data_processor.export_results_json(export_results, summary_stats)
+                json_data = exports['json']
                 st.download_button(
                     label="📋 Download JSON Report",
                     data=json_data,
@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+from batch_packer import estimate_tokens
+from model_backends import DEFAULT_MODEL_NAME, GeminiBackend, ModelBackend
+from rate_limiter import RateLimiter
+from resilience import is_quota_error
+
+class PoolExhaustedError(Exception):
+    """Raised when every backend in the pool is cooling down"""
+
+    # Looks like a quota error, so the retry policy backs off and tries again
+    code = 429
+
+class PoolMember:
+    """One backend in a pool, with its own rate budget and health"""
+
+    def __init__(self, backend, name, weight=1.0, requests_per_minute=60, tokens_per_minute=1000000):
+        self.backend = backend
+        self.name = name
+        self.weight = max(float(weight), 0.01)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.quota_errors = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+class BackendPool(ModelBackend):
+    """Spread calls over several backends, e.g. one per API key
+
+    Each call goes to the healthy member with the fewest calls in flight
+    relative to its weight. Quota errors bench a member for `cooldown`
+    seconds and the call moves on to the next member.
+    """
+
+    def __init__(self, members, cooldown=60.0, failure_threshold=3):
+        if not members:
+            raise ValueError("BackendPool needs at least one member")
+        self.members = list(members)
+        self.cooldown = cooldown
+        # Consecutive non-quota failures before a member is benched as unhealthy
+        self.failure_threshold = failure_threshold
+        self._lock = threading.Lock()
+
+        # The analyzer's shared limit should cover the whole pool, not one key
+        self.requests_per_minute = sum(m.rate_limiter.requests_per_minute for m in self.members)
+        self.tokens_per_minute = sum(m.rate_limiter.tokens_per_minute for m in self.members)
+
+    @property
+    def model_name(self):
+        # Results from different models must not share cache entries
+        return "+".join(sorted({m.backend.model_name for m in self.members}))
+
+    def generate(self, prompt):
+        tried = set()
+        while True:
+            member = self._select(tried, estimate_tokens(prompt))
+            try:
+                member.rate_limiter.acquire(estimate_tokens(prompt))
+                result = member.backend.generate(prompt)
+            except Exception as e:
+                self._record_failure(member, e)
+                tried.add(member.name)
+                if is_quota_error(e) and len(tried) < len(self.members):
+                    continue
+                raise
+            finally:
+                self._release(member)
+            self._record_success(member)
+            return result
+
+    def generate_stream(self, prompt):
+        tried = set()
+        while True:
+            member = self._select(tried, estimate_tokens(prompt))
+            started = False
+            try:
+                member.rate_limiter.acquire(estimate_tokens(prompt))
+                for chunk in member.backend.generate_stream(prompt):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._record_failure(member, e)
+                tried.add(member.name)
+                # Fail over only while nothing has been handed to the caller yet
+                if is_quota_error(e) and not started and len(tried) < len(self.members):
+                    continue
+                raise
+            finally:
+                self._release(member)
+            self._record_success(member)
+            return
+
+    def _select(self, tried, tokens):
+        """Reserve the least-loaded healthy member not tried yet for this call"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                m for m in self.members if m.name not in tried and m.cooldown_until <= now
+            ]
+            if not candidates:
+                soonest = min(m.cooldown_until for m in self.members) - now
+                raise PoolExhaustedError(f"All {len(self.members)} pool members are cooling down ({soonest:.0f}s left)")
+
+            member = min(
+                candidates,
+                key=lambda m: ((m.in_flight + 1) / m.weight, m.rate_limiter.estimated_wait(tokens))
+            )
+            member.in_flight += 1
+            member.calls += 1
+            return member
+
+    def _release(self, member):
+        with self._lock:
+            member.in_flight -= 1
+
+    def _record_success(self, member):
+        with self._lock:
+            member.consecutive_failures = 0
+
+    def _record_failure(self, member, error):
+        """Count a failure and bench the member after quota errors or repeated failures"""
+        with self._lock:
+            member.failures += 1
+            member.consecutive_failures += 1
+            if is_quota_error(error):
+                member.quota_errors += 1
+                member.cooldown_until = time.monotonic() + self.cooldown
+            elif member.consecutive_failures >= self.failure_threshold:
+                member.cooldown_until = time.monotonic() + self.cooldown
+                member.consecutive_failures = 0
+
+    def get_stats(self):
+        """Return per-member load and health"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                m.name: {
+                    "model": m.backend.model_name,
+                    "weight": m.weight,
+                    "calls": m.calls,
+                    "in_flight": m.in_flight,
+                    "failures": m.failures,
+                    "quota_errors": m.quota_errors,
+                    "cooling_down_seconds": round(max(0.0, m.cooldown_until - now), 1),
+                    "rate_limit": m.rate_limiter.get_stats()
+                }
+                for m in self.members
+            }
+
+def parse_key_spec(spec):
+    """Parse "key[:model[:weight]],..." into (key, model, weight) tuples"""
+    entries = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        fields = part.split(":")
+        key = fields[0]
+        model_name = fields[1] if len(fields) > 1 and fields[1] else DEFAULT_MODEL_NAME
+        weight = float(fields[2]) if len(fields) > 2 and fields[2] else 1.0
+        entries.append((key, model_name, weight))
+    return entries
+
+def create_gemini_pool(spec=None, requests_per_minute=None, tokens_per_minute=None, cooldown=None):
+    """Build a pool with one Gemini client per key listed in GEMINI_API_KEYS"""
+    spec = spec or os.getenv("GEMINI_API_KEYS", "")
+    requests_per_minute = requests_per_minute or int(os.getenv("GEMINI_KEY_REQUESTS_PER_MINUTE", "60"))
+    tokens_per_minute = tokens_per_minute or int(os.getenv("GEMINI_KEY_TOKENS_PER_MINUTE", "1000000"))
+    cooldown = cooldown if cooldown is not None else float(os.getenv("GEMINI_KEY_COOLDOWN", "60"))
+
+    members = []
+    for number, (key, model_name, weight) in enumerate(parse_key_spec(spec)):
+        backend = GeminiBackend(api_key=key, model_name=model_name, dedicated_client=True)
+        # Never expose the key itself in stats
+        members.append(PoolMember(
+            backend, f"key{number + 1}-{model_name}", weight, requests_per_minute, tokens_per_minute
+        ))
+    return BackendPool(members, cooldown=cooldown)
@@ -0,0 +1,89 @@
+import threading
+
+def estimate_tokens(text):
+    """Roughly estimate the token count of a text (about 4 characters per token)"""
+    return max(1, (len(text) + 3) // 4)
+
+class BatchPacker:
+    """Pack texts into batch requests that fit input and output token budgets"""
+
+    def __init__(self, max_input_tokens=4000, max_output_tokens=2048,
+                 prompt_overhead_tokens=250, item_overhead_tokens=10,
+                 output_tokens_per_item=60, max_items=40, outlier_tokens=None,
+                 on_stats=None):
+        self.max_input_tokens = max_input_tokens
+        self.max_output_tokens = max_output_tokens
+        self.prompt_overhead_tokens = prompt_overhead_tokens
+        self.item_overhead_tokens = item_overhead_tokens
+        self.output_tokens_per_item = output_tokens_per_item
+        # The output budget caps how many items one response can hold
+        self.max_items = max(1, min(max_items, max_output_tokens // output_tokens_per_item))
+        # Texts above this size are sent on their own rather than crowding a batch
+        self.text_budget = max(1, max_input_tokens - prompt_overhead_tokens)
+        self.outlier_tokens = outlier_tokens or self.text_budget // 2
+        self.on_stats = on_stats
+
+        self._lock = threading.Lock()
+        self._totals = {"requests": 0, "items": 0, "payload_tokens": 0, "prompt_tokens": 0}
+
+    def pack(self, texts):
+        """Split texts into batches, returned as lists of input indices"""
+        batches = []
+        current = []
+        current_tokens = 0
+        payload_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            payload_tokens += tokens
+            cost = tokens + self.item_overhead_tokens
+
+            if tokens >= self.outlier_tokens:
+                batches.append([i])
+                continue
+
+            if current and (current_tokens + cost > self.text_budget or len(current) >= self.max_items):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+
+            current.append(i)
+            current_tokens += cost
+
+        if current:
+            batches.append(current)
+
+        self._record(len(texts), len(batches), payload_tokens)
+        return batches
+
+    def _record(self, items, requests, payload_tokens):
+        """Update running totals and notify the statistics hook"""
+        prompt_tokens = payload_tokens + requests * self.prompt_overhead_tokens + items * self.item_overhead_tokens
+        with self._lock:
+            self._totals["requests"] += requests
+            self._totals["items"] += items
+            self._totals["payload_tokens"] += payload_tokens
+            self._totals["prompt_tokens"] += prompt_tokens
+
+        if self.on_stats:
+            self.on_stats(self._summarize(requests, items, payload_tokens, prompt_tokens))
+
+    def _summarize(self, requests, items, payload_tokens, prompt_tokens):
+        """Build a statistics dict from raw counts"""
+        capacity = requests * self.max_input_tokens
+        return {
+            "requests": requests,
+            "items": items,
+            "items_per_request": round(items / requests, 2) if requests else 0.0,
+            # Share of the input budget actually filled by prompt tokens
+            "fill_efficiency": round(prompt_tokens / capacity, 3) if capacity else 0.0,
+            # Share of sent tokens that are text rather than prompt overhead
+            "payload_share": round(payload_tokens / prompt_tokens, 3) if prompt_tokens else 0.0
+        }
+
+    def get_stats(self):
+        """Return packing statistics accumulated since startup"""
+        with self._lock:
+            totals = dict(self._totals)
+        return self._summarize(totals["requests"], totals["items"],
+                               totals["payload_tokens"], totals["prompt_tokens"])
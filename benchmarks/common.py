@@ -0,0 +1,111 @@
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+def percentile(values, pct):
+    """Return the pct-th percentile of values using linear interpolation"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def measure(func, repeat=3, trace_memory=True):
+    """Run func repeatedly, returning its last value, run times and peak memory"""
+    seconds = []
+    peak_bytes = 0
+    value = None
+
+    for run in range(repeat):
+        # Memory is traced on the first run only, since tracing slows execution
+        tracing = trace_memory and run == 0
+        if tracing:
+            tracemalloc.start()
+        started = time.perf_counter()
+        value = func()
+        seconds.append(time.perf_counter() - started)
+        if tracing:
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return value, seconds, peak_bytes
+
+def summarize(stage, size, seconds, peak_bytes, latencies=None, **extra):
+    """Build one result row for a benchmark stage"""
+    # Timings of the traced first run are skewed, so prefer the untraced ones
+    timed = seconds[1:] or seconds
+    median = percentile(timed, 50)
+    latencies = latencies if latencies is not None else timed
+    row = {
+        "stage": stage,
+        "size": size,
+        "runs": len(seconds),
+        "seconds": round(median, 6),
+        "throughput_per_second": round(size / median, 1) if median else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "latency_p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "peak_memory_mb": round(peak_bytes / (1024 * 1024), 2)
+    }
+    row.update(extra)
+    return row
+
+def print_rows(rows):
+    """Print result rows as an aligned table"""
+    header = f"{'stage':<22}{'size':>10}{'seconds':>12}{'items/s':>14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['stage']:<22}{row['size']:>10}{row['seconds']:>12.4f}{row['throughput_per_second']:>14.1f}"
+            f"{row['latency_p50_ms']:>10.2f}{row['latency_p95_ms']:>10.2f}{row['latency_p99_ms']:>10.2f}"
+            f"{row['peak_memory_mb']:>10.2f}"
+        )
+
+def write_results(path, name, rows, config):
+    """Write machine-readable results to a JSON file"""
+    payload = {
+        "benchmark": name,
+        "generated_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": config,
+        "results": rows
+    }
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+
+def compare_results(rows, baseline_path, threshold=0.10, metric="seconds", min_delta=0.0):
+    """Compare rows with a previous results file and return the regressions
+
+    Changes smaller than min_delta in absolute terms are treated as noise.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {(row["stage"], row["size"]): row for row in baseline.get("results", [])}
+
+    regressions = []
+    print(f"\nComparison with {baseline_path} ({metric}, threshold {threshold:.0%})")
+    for row in rows:
+        old = previous.get((row["stage"], row["size"]))
+        if not old or not old.get(metric):
+            continue
+        change = (row[metric] - old[metric]) / old[metric]
+        regressed = change > threshold and row[metric] - old[metric] > min_delta
+        flag = "REGRESSION" if regressed else ""
+        print(f"{row['stage']:<22}{row['size']:>10}{old[metric]:>12.4f} -> {row[metric]:<12.4f}{change:>+8.1%} {flag}")
+        if regressed:
+            regressions.append((row["stage"], row["size"], change))
+    return regressions
+
+def add_output_arguments(parser, default_output):
+    """Add the --output, --compare and --threshold options shared by benchmarks"""
+    parser.add_argument("--output", default=default_output, help="Where to write JSON results")
+    parser.add_argument("--compare", help="Previous results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative slowdown reported as a regression (default 0.10)")
@@ -0,0 +1,147 @@
+"""End-to-end benchmark of ingestion, analysis, aggregation and charting.
+
+Run from the repository root:
+
+    python -m benchmarks.pipeline_benchmark --sizes 1000,100000,1000000
+    python -m benchmarks.pipeline_benchmark --sizes 1000 --compare bench_pipeline.json
+
+The model is replaced by MockBackend, so no API key or network is needed.
+"""
+import argparse
+import io
+import random
+import sys
+import threading
+import time
+
+from benchmarks.common import add_output_arguments, compare_results, measure, print_rows, summarize, write_results
+from chart_generator import ChartGenerator
+from data_processor import DataProcessor
+from model_backends import MockBackend
+from sentiment_analyzer import SentimentAnalyzer
+
+SUBJECTS = ["The product", "Customer service", "Delivery", "The app", "This update", "The battery", "Support"]
+OPINIONS = [
+    "was great and I love it", "is the worst thing I have bought", "works as described",
+    "was terrible and broke quickly", "is excellent value for money", "was okay, nothing special",
+    "made me really happy", "was disappointing after a week", "is fantastic, will buy again"
+]
+DETAILS = ["", " Shipping took three days.", " I contacted them twice.", " The box was damaged.",
+           " Setup took five minutes.", " Would recommend to friends."]
+
+class TimedBackend:
+    """Backend wrapper recording the latency of every request"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        started = time.perf_counter()
+        result = self.backend.generate(prompt)
+        with self._lock:
+            self.latencies.append(time.perf_counter() - started)
+        return result
+
+def generate_corpus(size, seed=42):
+    """Return `size` synthetic review texts"""
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(SUBJECTS)} {rng.choice(OPINIONS)}.{rng.choice(DETAILS)} (ref {i})"
+        for i in range(size)
+    ]
+
+def corpus_to_csv(texts, seed=42):
+    """Encode texts as an uploaded-file-like CSV with a few extra columns"""
+    rng = random.Random(seed)
+    lines = ["id,rating,channel,review"]
+    for i, text in enumerate(texts):
+        lines.append(f"{i},{rng.randint(1, 5)},{rng.choice(['web', 'app', 'email'])},\"{text}\"")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def bench_ingestion(size, csv_bytes, repeat):
+    processor = DataProcessor()
+    _, seconds, peak = measure(lambda: processor.process_csv(io.BytesIO(csv_bytes)), repeat)
+    return summarize("ingestion_csv", size, seconds, peak)
+
+def bench_analysis(size, texts, repeat, latency, concurrency):
+    backend = TimedBackend(MockBackend(latency=latency, seed=1))
+    analyzer = SentimentAnalyzer(
+        backend=backend, use_cache=False, max_concurrency=concurrency,
+        requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12
+    )
+    results, seconds, peak = measure(lambda: analyzer.analyze_batch(texts), repeat)
+    row = summarize("analysis", size, seconds, peak, latencies=backend.latencies,
+                    requests=len(backend.latencies) // max(1, repeat))
+    return row, results, analyzer
+
+def bench_aggregation(size, analyzer, results, repeat):
+    summary, seconds, peak = measure(lambda: analyzer.get_summary_stats(results), repeat)
+    return summarize("aggregation", size, seconds, peak), summary
+
+def bench_charting(size, results, summary, repeat):
+    chart_gen = ChartGenerator()
+
+    def render_all():
+        chart_gen.create_sentiment_pie_chart(
+            summary['positive_count'], summary['negative_count'], summary['neutral_count']
+        )
+        chart_gen.create_sentiment_bar_chart(
+            summary['positive_count'], summary['negative_count'], summary['neutral_count']
+        )
+        chart_gen.create_confidence_chart(results)
+        chart_gen.create_intensity_chart(results)
+        chart_gen.create_emotion_chart(summary)
+
+    _, seconds, peak = measure(render_all, repeat)
+    return summarize("charting", size, seconds, peak)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000,1000000",
+                        help="Comma-separated corpus sizes (default 1000,100000,1000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (default 3)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock model latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batch requests in flight")
+    parser.add_argument("--stages", default="ingestion,analysis,aggregation,charting",
+                        help="Comma-separated stages to run")
+    add_output_arguments(parser, "bench_pipeline.json")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    stages = set(args.stages.split(","))
+    rows = []
+
+    for size in sizes:
+        texts = generate_corpus(size)
+        print(f"Benchmarking {size} texts...", file=sys.stderr)
+
+        if "ingestion" in stages:
+            rows.append(bench_ingestion(size, corpus_to_csv(texts), args.repeat))
+
+        if stages & {"analysis", "aggregation", "charting"}:
+            row, results, analyzer = bench_analysis(size, texts, args.repeat, args.latency, args.concurrency)
+            if "analysis" in stages:
+                rows.append(row)
+
+            row, summary = bench_aggregation(size, analyzer, results, args.repeat)
+            if "aggregation" in stages:
+                rows.append(row)
+
+            if "charting" in stages:
+                rows.append(bench_charting(size, results, summary, args.repeat))
+
+    print_rows(rows)
+    write_results(args.output, "pipeline", rows, vars(args))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        regressions = compare_results(rows, args.compare, args.threshold)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""Measure cold-start cost: module import times and the dashboard's time to first render.
+
+Run from the repository root:
+
+    python -m benchmarks.startup_benchmark --repeat 5
+    python -m benchmarks.startup_benchmark --compare bench_startup.json
+
+Every measurement runs in a fresh interpreter so nothing is imported yet.
+Imports are timed with `python -X importtime`; the first render runs app.py
+through Streamlit's AppTest with the mock backend, so no API key is needed.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.common import add_output_arguments, compare_results, percentile, write_results
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ["sentiment_analyzer", "model_backends", "chart_generator", "data_processor"]
+
+# Dependencies that should only load once a feature actually needs them
+HEAVY_MODULES = ["google.generativeai", "plotly", "pandas", "numpy", "dotenv"]
+
+RENDER_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+# The test harness pulls in some heavy modules itself; only count what the app adds
+preloaded = set(sys.modules)
+app = AppTest.from_file({app_path!r}, default_timeout=120).run()
+print(json.dumps({{
+    "seconds": time.perf_counter() - imported,
+    "harness_seconds": imported - started,
+    "exception": bool(app.exception),
+    "loaded": [name for name in {heavy!r} if name in sys.modules and name not in preloaded]
+}}))
+"""
+
+def benchmark_env():
+    """Environment for child interpreters: offline backend, throwaway cache"""
+    env = dict(os.environ)
+    env["SENTIMENT_BACKEND"] = "mock"
+    env["SENTIMENT_CACHE_PATH"] = ":memory:"
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+def parse_importtime(stderr):
+    """Return {module: cumulative seconds} from `-X importtime` output"""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            # Header line
+            continue
+        # Keep the first (outermost) timing of each module
+        timings.setdefault(name.strip(), int(cumulative) / 1e6)
+    return timings
+
+def time_import(module):
+    """Import module in a fresh interpreter and return its cumulative time and heavy imports"""
+    probe = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True, text=True, cwd=ROOT, env=benchmark_env(), check=True
+    )
+    timings = parse_importtime(completed.stderr)
+    loaded = [name for name in completed.stdout.strip().split(",") if name]
+    return timings.get(module, 0.0), loaded
+
+def time_first_render():
+    """Run the dashboard once in a fresh interpreter and return seconds until it rendered
+
+    Streamlit's own import is excluded, since it is the same for every version of the app.
+    """
+    script = RENDER_SCRIPT.format(app_path=os.path.join(ROOT, "app.py"), heavy=HEAVY_MODULES)
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True, text=True, cwd=ROOT, env=benchmark_env(), check=True
+    )
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    if report["exception"]:
+        raise RuntimeError("app.py raised an exception during the first render")
+    return report["seconds"], report["loaded"]
+
+def build_row(stage, seconds, loaded):
+    """Result row for one startup stage, using the median of repeated runs"""
+    return {
+        "stage": stage,
+        "size": 1,
+        "runs": len(seconds),
+        "seconds": round(percentile(seconds, 50), 4),
+        "min_seconds": round(min(seconds), 4),
+        "max_seconds": round(max(seconds), 4),
+        "heavy_imports": loaded
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement (default 5)")
+    parser.add_argument("--modules", default=",".join(MODULES), help="Comma-separated modules to time")
+    parser.add_argument("--skip-render", action="store_true", help="Only time imports")
+    parser.add_argument("--min-delta", type=float, default=0.01,
+                        help="Ignore slowdowns smaller than this many seconds (default 0.01)")
+    add_output_arguments(parser, "bench_startup.json")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for module in [m.strip() for m in args.modules.split(",") if m.strip()]:
+        runs = [time_import(module) for _ in range(args.repeat)]
+        rows.append(build_row(f"import:{module}", [seconds for seconds, _ in runs], runs[-1][1]))
+
+    if not args.skip_render:
+        runs = [time_first_render() for _ in range(args.repeat)]
+        rows.append(build_row("first_render", [seconds for seconds, _ in runs], runs[-1][1]))
+
+    header = f"{'stage':<30}{'median s':>10}{'min s':>10}{'max s':>10}  heavy imports"
+    print(header)
+    print("-" * (len(header) + 20))
+    for row in rows:
+        print(
+            f"{row['stage']:<30}{row['seconds']:>10.4f}{row['min_seconds']:>10.4f}{row['max_seconds']:>10.4f}"
+            f"  {', '.join(row['heavy_imports']) or '-'}"
+        )
+
+    write_results(args.output, "startup", rows, vars(args))
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare_results(rows, args.compare, args.threshold, min_delta=args.min_delta):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Compare the verbose and compact batch protocols on tokens and latency per item.
+
+Run from the repository root:
+
+    python -m benchmarks.wire_format_benchmark --size 2000 --ms-per-output-token 2
+
+Both protocols are answered by the same MockBackend scoring, so only the
+wire format differs. Decoding time is simulated per output token, because
+output tokens dominate real Gemini latency.
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.common import add_output_arguments, compare_results, percentile, write_results
+from benchmarks.pipeline_benchmark import TimedBackend, generate_corpus
+from model_backends import MockBackend
+from sentiment_analyzer import SentimentAnalyzer
+
+PROTOCOLS = ["verbose", "compact"]
+
+def bench_protocol(protocol, texts, latency, seconds_per_output_token, concurrency):
+    mock = MockBackend(latency=latency, seconds_per_output_token=seconds_per_output_token, seed=1)
+    backend = TimedBackend(mock)
+    analyzer = SentimentAnalyzer(
+        backend=backend, use_cache=False, protocol=protocol, max_concurrency=concurrency,
+        requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12
+    )
+
+    started = time.perf_counter()
+    results = analyzer.analyze_batch(texts)
+    seconds = time.perf_counter() - started
+
+    # Decode cost on its own, from one representative answer
+    sample_prompt = analyzer._build_batch_prompt(texts[:20])
+    sample_answer = mock.build_response(sample_prompt)
+    decode_started = time.perf_counter()
+    for _ in range(50):
+        analyzer._parse_batch_items(sample_answer)
+    decode_ms_per_item = (time.perf_counter() - decode_started) * 1000 / (50 * min(20, len(texts)))
+
+    stats = mock.get_stats()
+    size = len(texts)
+    return {
+        "stage": protocol,
+        "size": size,
+        "requests": stats["calls"],
+        "seconds": round(seconds, 4),
+        "throughput_per_second": round(size / seconds, 1) if seconds else 0.0,
+        "input_tokens_per_item": round(stats["input_tokens"] / size, 2),
+        "output_tokens_per_item": round(stats["output_tokens"] / size, 2),
+        "latency_ms_per_item": round(seconds * 1000 / size, 3),
+        "request_p50_ms": round(percentile(backend.latencies, 50) * 1000, 2),
+        "request_p95_ms": round(percentile(backend.latencies, 95) * 1000, 2),
+        "decode_ms_per_item": round(decode_ms_per_item, 4),
+        "neutral_results": sum(1 for r in results if r["sentiment"] == "neutral")
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=2000, help="Number of texts (default 2000)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed mock latency per request in seconds")
+    parser.add_argument("--ms-per-output-token", type=float, default=2.0,
+                        help="Simulated decoding time per output token in milliseconds")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batch requests in flight")
+    add_output_arguments(parser, "bench_wire_format.json")
+    args = parser.parse_args(argv)
+
+    texts = generate_corpus(args.size)
+    rows = [
+        bench_protocol(protocol, texts, args.latency, args.ms_per_output_token / 1000, args.concurrency)
+        for protocol in PROTOCOLS
+    ]
+
+    header = f"{'protocol':<10}{'requests':>10}{'in tok/item':>13}{'out tok/item':>14}{'ms/item':>10}{'p50 ms':>10}{'decode ms':>11}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['stage']:<10}{row['requests']:>10}{row['input_tokens_per_item']:>13.2f}"
+            f"{row['output_tokens_per_item']:>14.2f}{row['latency_ms_per_item']:>10.3f}"
+            f"{row['request_p50_ms']:>10.2f}{row['decode_ms_per_item']:>11.4f}"
+        )
+
+    verbose, compact = rows
+    print(
+        f"\nCompact uses {compact['output_tokens_per_item'] / verbose['output_tokens_per_item']:.0%} of the output tokens "
+        f"and {compact['latency_ms_per_item'] / verbose['latency_ms_per_item']:.0%} of the latency per item"
+    )
+
+    write_results(args.output, "wire_format", rows, vars(args))
+    print(f"Results written to {args.output}")
+
+    if args.compare and compare_results(rows, args.compare, args.threshold, metric="latency_ms_per_item"):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
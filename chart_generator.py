@@ -1,7 +1,3 @@
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-
 class ChartGenerator:
     def __init__(self):
         # Plotly doesn't need initialization
@@ -13,6 +9,9 @@ class ChartGenerator:
     
     def create_sentiment_pie_chart(self, positive, negative, neutral):
         """Create interactive pie chart with Plotly"""
+        # Plotly is heavy, so it loads with the first chart rather than at startup
+        import plotly.express as px
+        
         if positive + negative + neutral == 0:
             return None
         
@@ -46,6 +45,8 @@ class ChartGenerator:
     
     def create_sentiment_bar_chart(self, positive, negative, neutral):
         """Create interactive bar chart with Plotly"""
+        import plotly.express as px
+        
         if positive + negative + neutral == 0:
             return None
         
@@ -80,6 +81,8 @@ class ChartGenerator:
     
     def create_confidence_chart(self, results):
         """Create confidence distribution chart"""
+        import plotly.express as px
+        
         if not results:
             return None
         
@@ -120,6 +123,8 @@ class ChartGenerator:
     
     def create_intensity_chart(self, results):
         """Create intensity distribution chart"""
+        import plotly.express as px
+        
         if not results:
             return None
         
@@ -161,6 +166,8 @@ class ChartGenerator:
     
     def create_emotion_chart(self, summary_stats):
         """Create emotion frequency chart"""
+        import plotly.express as px
+        
         if not summary_stats.get('top_emotions'):
             return None
         
@@ -1,47 +1,138 @@
-import pandas as pd
+import codecs
 import io
+import itertools
 import json
+import tempfile
 from datetime import datetime
 
-class DataProcessor:
+from streaming_json import IncrementalJSONParser
+
+class TextStream:
+    """Texts of an upload produced lazily, and re-readable from the start
+
+    `metadata` holds running counts that are filled in as the texts are consumed.
+    """
+    
+    def __init__(self, uploaded_file, reader, metadata):
+        self.uploaded_file = uploaded_file
+        self._reader = reader
+        self._initial_metadata = metadata
+        self.metadata = dict(metadata)
+    
+    def __iter__(self):
+        self.uploaded_file.seek(0)
+        self.metadata = dict(self._initial_metadata)
+        return self._reader(self.uploaded_file, self.metadata)
+    
+    def head(self, n):
+        """Return the first n texts without reading further"""
+        return list(itertools.islice(iter(self), n))
+    
+    @property
+    def progress(self):
+        """Fraction of the upload read so far"""
+        size = getattr(self.uploaded_file, 'size', None)
+        if not size:
+            return 0.0
+        return min(1.0, self.uploaded_file.tell() / size)
+
+class ResultSpool:
+    """Every result of a streamed job, kept in a temporary file rather than memory
+    
+    Results are written as JSON lines and read back in order, so exports
+    can cover a whole job whose results do not fit in memory.
+    """
+    
     def __init__(self):
-        self.supported_formats = ['csv', 'txt', 'json']
+        self._file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+        self._count = 0
+    
+    def append(self, result):
+        self._file.write(json.dumps(result) + '\n')
+        self._count += 1
+    
+    def __len__(self):
+        return self._count
+    
+    def __iter__(self):
+        self._file.flush()
+        self._file.seek(0)
+        for line in self._file:
+            yield json.loads(line)
+        # Later appends go after the last result again
+        self._file.seek(0, io.SEEK_END)
     
-    def process_uploaded_file(self, uploaded_file):
+    def close(self):
+        """Delete the temporary file"""
+        self._file.close()
+
+class DataProcessor:
+    # Uploads at least this large are streamed instead of loaded whole
+    STREAMING_THRESHOLD_BYTES = 50 * 1024 * 1024
+    # Bytes read per step by the incremental JSON reader
+    JSON_READ_BYTES = 1024 * 1024
+    
+    def __init__(self, chunk_rows=50000, sample_rows=1000):
+        self.supported_formats = ['csv', 'txt', 'json', 'jsonl', 'ndjson']
+        # Rows per pandas chunk when streaming a CSV
+        self.chunk_rows = chunk_rows
+        # Rows read from the head of a CSV to pick its text column
+        self.sample_rows = sample_rows
+    
+    def process_uploaded_file(self, uploaded_file, text_column=None, key_path=None):
         """Process uploaded file and extract text data"""
         try:
             file_extension = uploaded_file.name.split('.')[-1].lower()
             
             if file_extension == 'csv':
-                return self.process_csv(uploaded_file)
+                return self.process_csv(uploaded_file, text_column)
             elif file_extension == 'txt':
                 return self.process_txt(uploaded_file)
             elif file_extension == 'json':
-                return self.process_json(uploaded_file)
+                return self.process_json(uploaded_file, key_path)
+            elif file_extension in ('jsonl', 'ndjson'):
+                return self.process_jsonl(uploaded_file, key_path)
             else:
                 raise ValueError(f"Unsupported file format: {file_extension}")
                 
         except Exception as e:
             raise Exception(f"Error processing file: {str(e)}")
     
-    def process_csv(self, uploaded_file):
+    def should_stream(self, uploaded_file):
+        """True when an upload is large enough to be streamed"""
+        return getattr(uploaded_file, 'size', 0) >= self.STREAMING_THRESHOLD_BYTES
+    
+    def stream_uploaded_file(self, uploaded_file, text_column=None, key_path=None):
+        """Return a TextStream over an uploaded file, or a LineIndex for text files"""
+        try:
+            file_extension = uploaded_file.name.split('.')[-1].lower()
+            
+            if file_extension == 'csv':
+                return self.stream_csv(uploaded_file, text_column=text_column)
+            elif file_extension == 'txt':
+                return self.stream_txt(uploaded_file)
+            elif file_extension == 'json':
+                return self.stream_json(uploaded_file, key_path)
+            elif file_extension in ('jsonl', 'ndjson'):
+                return self.stream_jsonl(uploaded_file, key_path)
+            
+            # Formats without a streaming reader are loaded whole
+            processed = self.process_uploaded_file(uploaded_file, text_column, key_path)
+            return TextStream(uploaded_file, lambda file, metadata: iter(processed['texts']), processed['metadata'])
+                
+        except Exception as e:
+            raise Exception(f"Error processing file: {str(e)}")
+    
+    def process_csv(self, uploaded_file, text_column=None):
         """Process CSV file"""
-        df = pd.read_csv(uploaded_file)
-        
-        # Try to find text columns
-        text_columns = []
-        for col in df.columns:
-            if df[col].dtype == 'object':  # String columns
-                # Check if column contains substantial text
-                avg_length = df[col].astype(str).str.len().mean()
-                if avg_length > 10:  # Assume text if average length > 10 chars
-                    text_columns.append(col)
+        # pandas loads on the first CSV rather than at startup
+        import pandas as pd
         
-        if not text_columns:
-            raise ValueError("No text columns found in CSV file")
+        text_column, text_columns = self._choose_text_column(uploaded_file, text_column)
         
-        # Use the first text column
-        text_column = text_columns[0]
+        # Only the chosen column is parsed from the full file
+        uploaded_file.seek(0)
+        df = pd.read_csv(uploaded_file, usecols=[text_column])
         texts = df[text_column].dropna().astype(str).tolist()
         
         return {
@@ -54,6 +145,68 @@ class DataProcessor:
             }
         }
     
+    def stream_csv(self, uploaded_file, chunk_rows=None, text_column=None):
+        """Stream texts from a CSV in chunks of rows, so memory stays flat for any file size"""
+        import pandas as pd
+        
+        chunk_rows = chunk_rows or self.chunk_rows
+        text_column, text_columns = self._choose_text_column(uploaded_file, text_column)
+        
+        def read_texts(file, metadata):
+            # Closing the reader explicitly keeps pandas from closing the upload itself
+            with pd.read_csv(file, chunksize=chunk_rows, usecols=[text_column]) as reader:
+                for chunk in reader:
+                    texts = chunk[text_column].dropna().astype(str)
+                    metadata['chunks'] += 1
+                    metadata['total_rows'] += len(chunk)
+                    metadata['total_texts'] += len(texts)
+                    yield from texts
+        
+        return TextStream(uploaded_file, read_texts, {
+            'source': 'CSV file (streamed)',
+            'total_rows': 0,
+            'total_texts': 0,
+            'chunks': 0,
+            'text_column': text_column,
+            'available_columns': text_columns
+        })
+    
+    def _choose_text_column(self, uploaded_file, text_column=None):
+        """Pick the CSV text column from a head sample, or check a pinned one
+
+        Returns the column and the detected text columns, best first.
+        """
+        import pandas as pd
+        
+        uploaded_file.seek(0)
+        if text_column is not None:
+            # Pinned by the caller: only the header is read
+            columns = list(pd.read_csv(uploaded_file, nrows=0).columns)
+            if text_column not in columns:
+                raise ValueError(f"Column '{text_column}' not found in CSV file")
+            return text_column, [text_column]
+        
+        sample = pd.read_csv(uploaded_file, nrows=self.sample_rows)
+        text_columns = self._find_text_columns(sample)
+        if not text_columns:
+            raise ValueError("No text columns found in CSV file")
+        return text_columns[0], text_columns
+    
+    def _find_text_columns(self, df):
+        """Return the string columns of a sample that look like free text, best first"""
+        scores = {}
+        for col in df.columns:
+            if df[col].dtype == 'object':  # String columns
+                values = df[col].dropna().astype(str)
+                if values.empty:
+                    continue
+                lengths = values.str.len()
+                # Assume text if average length > 10 chars
+                if lengths.mean() > 10:
+                    # Prose has spaces; long IDs, hashes and URLs do not
+                    scores[col] = lengths.mean() * (0.1 + values.str.contains(' ', regex=False).mean())
+        return sorted(scores, key=scores.get, reverse=True)
+    
     def process_txt(self, uploaded_file):
         """Process text file"""
         content = uploaded_file.read().decode('utf-8')
@@ -69,54 +222,186 @@ class DataProcessor:
             }
         }
     
-    def process_json(self, uploaded_file):
-        """Process JSON file"""
-        content = uploaded_file.read().decode('utf-8')
-        data = json.loads(content)
+    def stream_txt(self, uploaded_file):
+        """Index the non-blank lines of a text file without loading it
         
-        texts = []
+        The upload is memory-mapped (spooled to a temporary file first when it
+        only lives in memory) and lines are decoded when they are read, so
+        texts can be sliced by index for batches and previews.
+        """
+        # Imported here so importing this module does not pull in numpy
+        from line_index import LineIndex
+        
+        return LineIndex.from_upload(uploaded_file, {'source': 'Text file'})
+    
+    def process_json(self, uploaded_file, field_path=None):
+        """Process JSON file"""
+        container_path, item_path = self._split_field_path(field_path)
+        # Files small enough to load whole are parsed by json in one pass
+        data = json.loads(uploaded_file.read().decode('utf-8-sig'))
+        for key in container_path:
+            data = data.get(key) if isinstance(data, dict) else None
         
         if isinstance(data, list):
-            # Array of objects or strings
-            for item in data:
-                if isinstance(item, str):
-                    texts.append(item)
-                elif isinstance(item, dict):
-                    # Try to find text fields
-                    for key, value in item.items():
-                        if isinstance(value, str) and len(value) > 10:
-                            texts.append(value)
-                            break
+            kind, members = 'array', data
         elif isinstance(data, dict):
-            # Single object - extract text values
-            for key, value in data.items():
-                if isinstance(value, str) and len(value) > 10:
-                    texts.append(value)
+            kind, members = 'object', data.items()
+        else:
+            kind, members = None, []
+        
+        texts = []
+        items_without_text = 0
+        for member in members:
+            text = self._json_member_text(kind, member, container_path, item_path)
+            if isinstance(text, str):
+                texts.append(text)
+            else:
+                items_without_text += 1
         
         return {
             'texts': texts,
             'metadata': {
                 'source': 'JSON file',
-                'total_texts': len(texts)
+                'total_texts': len(texts),
+                'total_items': len(members),
+                'items_without_text': items_without_text,
+                'malformed_items': 0,
+                'field_path': field_path
             }
         }
     
-    def export_results_csv(self, results, summary_stats):
-        """Export analysis results to CSV format"""
-        # Create DataFrame from results
-        df_data = []
-        for result in results:
-            df_data.append({
-                'text': result['original_text'],
-                'sentiment': result['sentiment'],
-                'confidence': result['confidence'],
-                'intensity': result['intensity'],
-                'emotions': ', '.join(result['emotions']),
-                'key_phrases': ', '.join(result['key_phrases']),
-                'analyzed_at': result['analyzed_at']
-            })
+    def stream_json(self, uploaded_file, field_path=None):
+        """Stream texts from a JSON document without building its object tree
+        
+        Members of the top-level array or object are parsed one at a time and
+        their text is picked as process_json does.
+        """
+        container_path, item_path = self._split_field_path(field_path)
+        
+        def read_texts(file, metadata):
+            parser = IncrementalJSONParser(path=container_path)
+            # Decodes across chunk boundaries that split a multi-byte character
+            decoder = codecs.getincrementaldecoder('utf-8-sig')()
+            while not parser.finished:
+                data = file.read(self.JSON_READ_BYTES)
+                for member in parser.feed(decoder.decode(data, final=not data)):
+                    metadata['total_items'] += 1
+                    text = self._json_member_text(parser.kind, member, container_path, item_path)
+                    if not isinstance(text, str):
+                        metadata['items_without_text'] += 1
+                        continue
+                    metadata['total_texts'] += 1
+                    yield text
+                metadata['malformed_items'] = parser.skipped
+                if not data:
+                    break
+        
+        return TextStream(uploaded_file, read_texts, {
+            'source': 'JSON file',
+            'total_texts': 0,
+            'total_items': 0,
+            'items_without_text': 0,
+            'malformed_items': 0,
+            'field_path': field_path
+        })
+    
+    def _split_field_path(self, field_path):
+        """Split a JSON field path at "*" into the container keys and the per-member path
+        
+        "data.reviews.*.text" reads .text from each member of data.reviews; a
+        path without "*" applies to each member of the top-level container.
+        """
+        segments = field_path.split('.') if field_path else []
+        if '*' not in segments:
+            return [], field_path
+        star = segments.index('*')
+        return segments[:star], '.'.join(segments[star + 1:]) or None
+    
+    def _json_member_text(self, kind, member, container_path, item_path):
+        """Pick the text of one member of a JSON array or object, or return None
+        
+        Without a path: strings of an array, the first string field longer than
+        10 chars of each object in it, or every such string value of a top-level
+        object. With one, the path is resolved in each array element, or from
+        the root of a top-level object ("summary", "meta.title").
+        """
+        if kind == 'array' or container_path:
+            value = member if kind == 'array' else member[1]
+            return self._resolve_key_path(value, item_path) if item_path else self._find_text_value(value)
         
-        df = pd.DataFrame(df_data)
+        key, value = member
+        if item_path:
+            first, _, rest = item_path.partition('.')
+            if key != first:
+                return None
+            return self._resolve_key_path(value, rest) if rest else value
+        return value if isinstance(value, str) and len(value) > 10 else None
+    
+    def process_jsonl(self, uploaded_file, key_path=None):
+        """Process newline-delimited JSON file"""
+        stream = self.stream_jsonl(uploaded_file, key_path)
+        texts = list(stream)
+        return {'texts': texts, 'metadata': stream.metadata}
+    
+    def stream_jsonl(self, uploaded_file, key_path=None):
+        """Stream texts from newline-delimited JSON, one line at a time
+        
+        key_path picks the text field, e.g. "payload.message" or "messages.0.text";
+        without it the first string field longer than 10 chars is used. Malformed
+        lines are counted and skipped.
+        """
+        def read_texts(file, metadata):
+            # Iterating the binary upload yields one line at a time
+            for line in file:
+                if not line.strip():
+                    continue
+                metadata['total_lines'] += 1
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    metadata['malformed_lines'] += 1
+                    continue
+                
+                text = self._resolve_key_path(item, key_path) if key_path else self._find_text_value(item)
+                if not isinstance(text, str) or not text.strip():
+                    metadata['lines_without_text'] += 1
+                    continue
+                metadata['total_texts'] += 1
+                yield text
+        
+        return TextStream(uploaded_file, read_texts, {
+            'source': 'JSONL file',
+            'total_lines': 0,
+            'total_texts': 0,
+            'malformed_lines': 0,
+            'lines_without_text': 0,
+            'key_path': key_path
+        })
+    
+    def _resolve_key_path(self, item, key_path):
+        """Follow a dotted key path through objects and list indices, or return None"""
+        for key in key_path.split('.'):
+            if isinstance(item, dict):
+                item = item.get(key)
+            elif isinstance(item, list) and key.lstrip('-').isdigit() and -len(item) <= int(key) < len(item):
+                item = item[int(key)]
+            else:
+                return None
+        return item
+    
+    def _find_text_value(self, item):
+        """Return a string item, or the first string field longer than 10 chars of an object"""
+        if isinstance(item, str):
+            return item
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if isinstance(value, str) and len(value) > 10:
+                    return value
+        return None
+    
+    def export_results_csv(self, results, summary_stats):
+        """Export analysis results (a list or a ResultSpool) to CSV format"""
+        import pandas as pd
         
         # Add summary stats as comments
         summary_text = f"""
@@ -130,25 +415,52 @@ class DataProcessor:
 # Average Intensity: {summary_stats.get('average_intensity', 0)}
 """
         
-        # Convert to CSV
+        # Convert to CSV a block of rows at a time, so spooled results are never all loaded
         output = io.StringIO()
         output.write(summary_text)
-        df.to_csv(output, index=False)
+        rows = (
+            {
+                'text': result['original_text'],
+                'sentiment': result['sentiment'],
+                'confidence': result['confidence'],
+                'intensity': result['intensity'],
+                'emotions': ', '.join(result['emotions']),
+                'key_phrases': ', '.join(result['key_phrases']),
+                'analyzed_at': result['analyzed_at']
+            }
+            for result in results
+        )
+        first = True
+        while True:
+            block = list(itertools.islice(rows, self.chunk_rows))
+            if not block and not first:
+                break
+            pd.DataFrame(block).to_csv(output, index=False, header=first)
+            first = False
+            if not block:
+                break
         
         return output.getvalue()
     
     def export_results_json(self, results, summary_stats):
-        """Export analysis results to JSON format"""
-        export_data = {
-            'metadata': {
-                'generated_at': datetime.now().isoformat(),
-                'total_analyzed': len(results),
-                'summary_stats': summary_stats
-            },
-            'results': results
+        """Export analysis results (a list or a ResultSpool) to JSON format"""
+        export_metadata = {
+            'generated_at': datetime.now().isoformat(),
+            'total_analyzed': len(results),
+            'summary_stats': summary_stats
         }
         
-        return json.dumps(export_data, indent=2)
+        # Same layout as json.dumps(..., indent=2), written one result at a time
+        output = io.StringIO()
+        output.write('{\n  "metadata": ' + json.dumps(export_metadata, indent=2).replace('\n', '\n  '))
+        output.write(',\n  "results": [')
+        count = 0
+        for result in results:
+            output.write((',' if count else '') + '\n    ' + json.dumps(result, indent=2).replace('\n', '\n    '))
+            count += 1
+        output.write('\n  ]\n}' if count else ']\n}')
+        
+        return output.getvalue()
     
     def create_sample_data(self):
         """Create sample data for testing"""
@@ -0,0 +1,173 @@
+import re
+from datetime import datetime
+
+# Word weights: positive values signal positive sentiment, negative values negative
+DEFAULT_LEXICON = {
+    # Positive
+    "good": 1.0, "great": 2.0, "excellent": 2.5, "amazing": 2.5, "awesome": 2.5,
+    "love": 2.0, "loved": 2.0, "loves": 2.0, "lovely": 2.0, "best": 2.0,
+    "wonderful": 2.5, "fantastic": 2.5, "outstanding": 2.5, "superb": 2.5,
+    "perfect": 2.5, "perfectly": 2.0, "brilliant": 2.5, "incredible": 2.5,
+    "happy": 2.0, "glad": 1.5, "pleased": 1.5, "satisfied": 1.5, "delighted": 2.5,
+    "enjoy": 1.5, "enjoyed": 1.5, "like": 1.0, "liked": 1.0, "nice": 1.0,
+    "fine": 0.5, "recommend": 1.5, "recommended": 1.5, "impressive": 2.0,
+    "impressed": 2.0, "beautiful": 2.0, "fast": 1.0, "quick": 1.0, "easy": 1.0,
+    "helpful": 1.5, "friendly": 1.5, "reliable": 1.5, "smooth": 1.0,
+    "comfortable": 1.0, "worth": 1.0, "value": 0.5, "favorite": 2.0,
+    "favourite": 2.0, "exceeded": 2.0, "thank": 1.0, "thanks": 1.0,
+    "solid": 1.0, "fun": 1.5, "exciting": 2.0, "excited": 2.0, "superior": 1.5,
+    "flawless": 2.5, "terrific": 2.5, "stellar": 2.5, "pleasant": 1.5,
+    "affordable": 1.0, "clean": 0.5, "works": 0.5, "working": 0.5,
+    "win": 1.5, "winner": 2.0, "success": 1.5, "successful": 1.5,
+    "improved": 1.0, "improvement": 1.0, "positive": 1.0, "appreciate": 1.5,
+    # Negative
+    "bad": -1.5, "terrible": -2.5, "awful": -2.5, "horrible": -2.5, "hate": -2.5,
+    "hated": -2.5, "worst": -3.0, "disappointing": -2.0, "disappointed": -2.0,
+    "poor": -1.5, "poorly": -1.5, "broken": -2.0, "broke": -2.0, "useless": -2.5,
+    "waste": -2.0, "wasted": -2.0, "slow": -1.0, "expensive": -1.0,
+    "overpriced": -1.5, "annoying": -1.5, "annoyed": -1.5, "angry": -2.0,
+    "frustrating": -2.0, "frustrated": -2.0, "sad": -1.5, "unhappy": -2.0,
+    "upset": -1.5, "fail": -2.0, "failed": -2.0, "fails": -2.0, "failure": -2.0,
+    "defective": -2.5, "faulty": -2.0, "damaged": -2.0, "misleading": -2.0,
+    "problem": -1.0, "problems": -1.0, "issue": -1.0, "issues": -1.0,
+    "bug": -1.0, "bugs": -1.0, "crash": -2.0, "crashes": -2.0, "crashed": -2.0,
+    "refund": -1.0, "return": -0.5, "returned": -1.0, "cheap": -0.5,
+    "rude": -2.0, "unreliable": -2.0, "difficult": -1.0, "confusing": -1.0,
+    "mediocre": -1.0, "dirty": -1.5, "late": -1.0, "delayed": -1.0,
+    "never": -0.5, "scam": -3.0, "fraud": -3.0, "garbage": -2.5, "trash": -2.5,
+    "junk": -2.5, "pathetic": -2.5, "disgusting": -3.0, "dreadful": -2.5,
+    "lousy": -2.0, "inferior": -1.5, "regret": -2.0, "avoid": -2.0,
+    "negative": -1.0, "worse": -2.0, "lacking": -1.0, "unacceptable": -2.5
+}
+
+DEFAULT_NEGATORS = [
+    "not", "no", "never", "cannot", "without", "hardly", "barely", "neither", "nor",
+    "dont", "doesnt", "didnt", "isnt", "wasnt", "arent", "werent", "cant", "couldnt",
+    "wont", "wouldnt", "shouldnt", "aint"
+]
+
+# Separates texts in the joined column; matched by neither \w nor \s
+_SEPARATOR = "\x00"
+
+def _trie_pattern(words):
+    """Build a regex alternation from a character trie of the words"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not end:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if end else body
+
+    return build(trie)
+
+class LexiconScorer:
+    """Fast local sentiment scorer that handles whole columns in one regex pass"""
+
+    def __init__(self, lexicon=None, negators=None, negation_window=2):
+        self.lexicon = {word.lower(): float(weight) for word, weight in (lexicon or DEFAULT_LEXICON).items()}
+        self.negators = [word.lower() for word in (negators or DEFAULT_NEGATORS)]
+
+        # Negators may be followed by a few words before the sentiment word ("not very good")
+        negator_pattern = r"(?:" + _trie_pattern(self.negators) + r"|\w+n't)"
+        pattern = (
+            r"\b(?:(?P<neg>" + negator_pattern + r")(?:\s+\w+){0," + str(negation_window) + r"}?\s+)?"
+            r"(?P<word>" + _trie_pattern(self.lexicon) + r")\b"
+        )
+        # Matching pre-lowercased text is much faster than IGNORECASE
+        self._pattern = re.compile(pattern)
+        self._pattern_ignorecase = re.compile(pattern, re.IGNORECASE)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Load a lexicon from a file with one `word<TAB>weight` entry per line"""
+        lexicon = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                word, weight = line.split("\t")[:2]
+                lexicon[word] = float(weight)
+        return cls(lexicon=lexicon, **kwargs)
+
+    def score(self, texts):
+        """Return net scores and matched words for every text"""
+        # Imported on first use so importing the analyzer does not load numpy
+        import numpy as np
+
+        texts = [str(text).replace(_SEPARATOR, " ") for text in texts]
+        count = len(texts)
+        if count == 0:
+            return np.zeros(0), []
+
+        # Scan the whole column as one string, then map matches back to rows
+        joined = _SEPARATOR.join(texts)
+        lowered = joined.lower()
+        if len(lowered) == len(joined):
+            matches = self._pattern.finditer(lowered)
+        else:
+            # Some characters change length when lowercased, which would shift offsets
+            matches = self._pattern_ignorecase.finditer(joined)
+
+        starts = np.zeros(count, dtype=np.int64)
+        np.cumsum([len(text) + 1 for text in texts[:-1]], out=starts[1:])
+
+        positions = []
+        weights = []
+        words = []
+        for match in matches:
+            word = match.group("word").lower()
+            weight = self.lexicon[word]
+            if match.group("neg"):
+                weight = -weight
+                word = "not " + word
+            positions.append(match.start())
+            weights.append(weight)
+            words.append(word)
+
+        rows = np.searchsorted(starts, np.array(positions, dtype=np.int64), side="right") - 1
+        scores = np.bincount(rows, weights=np.array(weights, dtype=float), minlength=count)
+
+        matched = [[] for _ in range(count)]
+        for row, word in zip(rows.tolist(), words):
+            matched[row].append(word)
+
+        return scores, matched
+
+    def analyze(self, texts):
+        """Return result dicts and decision margins (0 to 1) for every text"""
+        import numpy as np
+
+        texts = [str(text) for text in texts]
+        scores, matched = self.score(texts)
+
+        # Margin grows with the net score: one strong word gives about 0.7
+        margins = np.abs(scores) / (np.abs(scores) + 1.0)
+        sentiments = np.where(scores > 0, "positive", np.where(scores < 0, "negative", "neutral"))
+        confidences = np.where(scores == 0, 0.5, np.round(0.5 + 0.3 * margins, 2))
+        intensities = np.clip(np.rint(5 + np.abs(scores)), 1, 10).astype(int)
+        analyzed_at = datetime.now().isoformat()
+
+        results = [
+            {
+                "sentiment": str(sentiments[i]),
+                "confidence": float(confidences[i]),
+                "emotions": ["neutral"],
+                "key_phrases": list(dict.fromkeys(matched[i]))[:5],
+                "intensity": int(intensities[i]),
+                "original_text": text[:100] + "..." if len(text) > 100 else text,
+                "analyzed_at": analyzed_at
+            }
+            for i, text in enumerate(texts)
+        ]
+        return results, margins
@@ -0,0 +1,156 @@
+import io
+import mmap
+import shutil
+import tempfile
+from collections.abc import Sequence
+
+import numpy as np
+
+# Bytes str.strip() does not remove; it strips \t \n \v \f \r, the \x1c-\x1f separators and space
+_CONTENT = np.ones(256, dtype=bool)
+_CONTENT[[9, 10, 11, 12, 13, 28, 29, 30, 31, 32]] = False
+
+# Bytes no multi-byte whitespace character (U+0085, U+00A0, U+1680, U+2000-U+3000)
+# is encoded with: everything but continuation bytes and the lead bytes C2, E1, E2, E3
+_SOLID = _CONTENT.copy()
+_SOLID[0x80:0xC0] = False
+_SOLID[[0xC2, 0xE1, 0xE2, 0xE3]] = False
+
+_UTF8_BOM = b"\xef\xbb\xbf"
+
+class LineIndex(Sequence):
+    """Non-blank lines of a text file, memory-mapped and decoded on demand
+
+    Only the start and end offset of each line is kept in memory, so any
+    line or slice of lines can be read by index without the file resident.
+    Lines are returned stripped, like `str.strip()` on each line of the text.
+    """
+
+    # Bytes scanned per step while building the offsets
+    BLOCK_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, file, metadata=None, owns_file=False):
+        self._file = file
+        # Temporary copies are deleted on close; caller-provided files are left open
+        self._owns_file = owns_file
+        self._mmap = None
+        self.metadata = dict(metadata or {})
+        # Lines handed out so far, for progress while iterating
+        self._position = 0
+
+        size = file.seek(0, io.SEEK_END)
+        # Offsets fit in 32 bits for files under 4 GB, halving the index
+        dtype = np.uint32 if size < 2 ** 32 else np.int64
+        if size:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._starts, self._ends = self._build_offsets(self._mmap, size, dtype)
+        else:
+            # mmap cannot map an empty file
+            self._starts = self._ends = np.zeros(0, dtype=dtype)
+
+        self.metadata["total_lines"] = len(self)
+
+    @classmethod
+    def from_upload(cls, uploaded_file, metadata=None):
+        """Index an upload, spooling it to a temporary file when it is not one already"""
+        uploaded_file.seek(0)
+        try:
+            uploaded_file.fileno()
+            return cls(uploaded_file, metadata)
+        except (AttributeError, io.UnsupportedOperation, OSError):
+            pass
+
+        # In-memory uploads are copied out in chunks so they can be mapped
+        file = tempfile.TemporaryFile()
+        shutil.copyfileobj(uploaded_file, file, 1024 * 1024)
+        file.flush()
+        return cls(file, metadata, owns_file=True)
+
+    def _build_offsets(self, data, size, dtype):
+        """Return the start and end offsets of every non-blank line"""
+        starts, ends = [], []
+        position = len(_UTF8_BOM) if data[:len(_UTF8_BOM)] == _UTF8_BOM else 0
+
+        while position < size:
+            if position + self.BLOCK_BYTES >= size:
+                end = size
+            else:
+                # Blocks end on a line break so no line spans two of them
+                end = data.rfind(b"\n", position, position + self.BLOCK_BYTES) + 1
+                if end <= position:
+                    end = data.find(b"\n", position) + 1 or size
+            block = np.frombuffer(data[position:end], dtype=np.uint8)
+
+            breaks = np.flatnonzero(block == 10)
+            line_ends = breaks if block[-1] == 10 else np.append(breaks, len(block))
+            line_starts = np.concatenate(([0], breaks + 1))[:len(line_ends)]
+
+            # A line is kept if any of its bytes is not whitespace
+            kept = np.logical_or.reduceat(_CONTENT[block], line_starts)
+            # Lines made only of bytes that could spell out multi-byte whitespace
+            # (no-break space, U+3000) are decoded and checked the way strip() sees them
+            solid = np.logical_or.reduceat(_SOLID[block], line_starts)
+            for line in np.flatnonzero(kept & ~solid).tolist():
+                text = bytes(block[line_starts[line]:line_ends[line]]).decode("utf-8", errors="replace")
+                kept[line] = bool(text.strip())
+            starts.append((line_starts[kept] + position).astype(dtype))
+            ends.append((line_ends[kept] + position).astype(dtype))
+            position = end
+
+        empty = [np.zeros(0, dtype=dtype)]
+        return np.concatenate(starts or empty), np.concatenate(ends or empty)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            lines = [
+                self._decode(start, end)
+                for start, end in zip(self._starts[index].tolist(), self._ends[index].tolist())
+            ]
+            stop = index.indices(len(self))[1]
+            self._position = max(self._position, min(stop, len(self)))
+            return lines
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        return self._decode(int(self._starts[index]), int(self._ends[index]))
+
+    def __iter__(self):
+        self._position = 0
+        for offset in range(0, len(self), 1000):
+            yield from self[offset:offset + 1000]
+
+    def _decode(self, start, end):
+        return self._mmap[start:end].decode("utf-8", errors="replace").strip()
+
+    def head(self, n):
+        """Return the first n lines"""
+        return [self._decode(start, end) for start, end in zip(self._starts[:n].tolist(), self._ends[:n].tolist())]
+
+    @property
+    def progress(self):
+        """Fraction of the lines handed out so far"""
+        return self._position / len(self) if len(self) else 1.0
+
+    @property
+    def nbytes(self):
+        """Memory held by the offset index"""
+        return self._starts.nbytes + self._ends.nbytes
+
+    def close(self):
+        """Unmap the file and delete any temporary copy"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._owns_file:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,269 @@
+"""Fast CPU sentiment classifier distilled from cached Gemini labels.
+
+Train it offline from the result cache and save it next to the app:
+
+    python local_classifier.py --cache .sentiment_cache.sqlite3 --output local_model.npz
+
+SentimentAnalyzer loads the saved model through `local_model_path` (or the
+SENTIMENT_LOCAL_MODEL environment variable) and uses it for the cascade and
+for `analyze_local`.
+"""
+import argparse
+import json
+import re
+import zlib
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+SENTIMENTS = ["positive", "negative", "neutral"]
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+def hash_features(texts, n_features=2 ** 18):
+    """Turn texts into L2-normalized hashed unigram and bigram counts in CSR form"""
+    indptr = [0]
+    indices = []
+    values = []
+
+    for text in texts:
+        tokens = _TOKEN_RE.findall(str(text).lower())
+        grams = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+        counts = Counter(zlib.crc32(gram.encode("utf-8")) % n_features for gram in grams)
+
+        if counts:
+            row_values = np.log1p(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+            row_values /= np.sqrt(np.dot(row_values, row_values))
+            indices.extend(counts.keys())
+            values.extend(row_values.tolist())
+        indptr.append(len(indices))
+
+    return (
+        np.array(indptr, dtype=np.int64),
+        np.array(indices, dtype=np.int64),
+        np.array(values, dtype=np.float64)
+    )
+
+def _sparse_dot(indptr, indices, values, weights):
+    """Multiply a CSR matrix by a dense (n_features, k) weight matrix"""
+    n_rows = len(indptr) - 1
+    rows = np.repeat(np.arange(n_rows), np.diff(indptr))
+    contributions = weights[indices] * values[:, None]
+    return np.stack(
+        [np.bincount(rows, weights=contributions[:, k], minlength=n_rows) for k in range(weights.shape[1])],
+        axis=1
+    )
+
+def _sparse_gradient(indptr, indices, values, deltas, n_features):
+    """Compute X^T @ deltas for a CSR matrix X"""
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    weighted = deltas[rows] * values[:, None]
+    return np.stack(
+        [np.bincount(indices, weights=weighted[:, k], minlength=n_features) for k in range(deltas.shape[1])],
+        axis=1
+    )
+
+def _softmax(logits):
+    shifted = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+def _slice_rows(features, start, stop):
+    """Return rows start:stop of a CSR matrix"""
+    indptr, indices, values = features
+    lo, hi = indptr[start], indptr[stop]
+    return indptr[start:stop + 1] - lo, indices[lo:hi], values[lo:hi]
+
+class LocalClassifier:
+    """Linear classifier over hashed n-grams predicting sentiment and intensity"""
+
+    def __init__(self, n_features=2 ** 18):
+        self.n_features = n_features
+        # Columns 0-2 are sentiment logits, column 3 predicts scaled intensity
+        self.weights = np.zeros((n_features, 4))
+        self.bias = np.zeros(4)
+        self.emotions = {sentiment: ["neutral"] for sentiment in SENTIMENTS}
+        self.trained_at = None
+
+    def fit(self, texts, sentiments, intensities, epochs=8, batch_size=2048,
+            learning_rate=0.5, l2=1e-6, seed=0):
+        """Train with mini-batch Adagrad on softmax and squared losses"""
+        features = hash_features(texts, self.n_features)
+        labels = np.array([SENTIMENTS.index(s) for s in sentiments])
+        targets = np.zeros((len(labels), 4))
+        targets[np.arange(len(labels)), labels] = 1.0
+        targets[:, 3] = (np.asarray(intensities, dtype=float) - 5.5) / 4.5
+
+        rng = np.random.default_rng(seed)
+        grad_sq = np.full_like(self.weights, 1e-8)
+        bias_sq = np.full_like(self.bias, 1e-8)
+
+        for _ in range(epochs):
+            order = rng.permutation(len(labels))
+            for start in range(0, len(order), batch_size):
+                batch = np.sort(order[start:start + batch_size])
+                rows = self._take_rows(features, batch)
+
+                outputs = _sparse_dot(*rows, self.weights) + self.bias
+                deltas = np.empty_like(outputs)
+                deltas[:, :3] = _softmax(outputs[:, :3]) - targets[batch, :3]
+                deltas[:, 3] = outputs[:, 3] - targets[batch, 3]
+                deltas /= len(batch)
+
+                gradient = _sparse_gradient(*rows, deltas, self.n_features) + l2 * self.weights
+                bias_gradient = deltas.sum(axis=0)
+
+                grad_sq += gradient ** 2
+                bias_sq += bias_gradient ** 2
+                self.weights -= learning_rate * gradient / np.sqrt(grad_sq)
+                self.bias -= learning_rate * bias_gradient / np.sqrt(bias_sq)
+
+        self.trained_at = datetime.now().isoformat()
+        return self
+
+    def _take_rows(self, features, row_ids):
+        """Gather arbitrary rows of a CSR matrix"""
+        indptr, indices, values = features
+        starts = indptr[row_ids]
+        lengths = indptr[row_ids + 1] - starts
+        new_indptr = np.concatenate([[0], np.cumsum(lengths)])
+        positions = np.repeat(starts - new_indptr[:-1], lengths) + np.arange(new_indptr[-1])
+        return new_indptr, indices[positions], values[positions]
+
+    def predict(self, texts, chunk_size=20000):
+        """Return sentiment probabilities and intensities for texts"""
+        probabilities = []
+        intensities = []
+        for start in range(0, len(texts), chunk_size):
+            features = hash_features(texts[start:start + chunk_size], self.n_features)
+            outputs = _sparse_dot(*features, self.weights) + self.bias
+            probabilities.append(_softmax(outputs[:, :3]))
+            intensities.append(np.clip(np.rint(outputs[:, 3] * 4.5 + 5.5), 1, 10))
+        if not probabilities:
+            return np.zeros((0, 3)), np.zeros(0)
+        return np.vstack(probabilities), np.concatenate(intensities)
+
+    def analyze(self, texts):
+        """Return result dicts and decision margins (0 to 1) for every text"""
+        texts = [str(text) for text in texts]
+        probabilities, intensities = self.predict(texts)
+
+        ordered = np.sort(probabilities, axis=1)
+        margins = ordered[:, -1] - ordered[:, -2] if len(texts) else np.zeros(0)
+        labels = probabilities.argmax(axis=1)
+        analyzed_at = datetime.now().isoformat()
+
+        results = [
+            {
+                "sentiment": SENTIMENTS[labels[i]],
+                "confidence": round(float(probabilities[i, labels[i]]), 2),
+                "emotions": list(self.emotions[SENTIMENTS[labels[i]]]),
+                "key_phrases": [],
+                "intensity": int(intensities[i]),
+                "original_text": text[:100] + "..." if len(text) > 100 else text,
+                "analyzed_at": analyzed_at
+            }
+            for i, text in enumerate(texts)
+        ]
+        return results, margins
+
+    def save(self, path):
+        """Save the model to an .npz file"""
+        meta = {"n_features": self.n_features, "emotions": self.emotions, "trained_at": self.trained_at}
+        np.savez_compressed(path, weights=self.weights.astype(np.float32), bias=self.bias, meta=json.dumps(meta))
+
+    @classmethod
+    def load(cls, path):
+        """Load a model saved with save()"""
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            model = cls(n_features=meta["n_features"])
+            model.weights = data["weights"].astype(np.float64)
+            model.bias = data["bias"]
+        model.emotions = meta["emotions"]
+        model.trained_at = meta["trained_at"]
+        return model
+
+def _top_emotions(sentiments, emotion_lists):
+    """Most frequent emotions the LLM reported for each sentiment"""
+    top = {}
+    for sentiment in SENTIMENTS:
+        counts = Counter(
+            emotion for label, emotions in zip(sentiments, emotion_lists) if label == sentiment
+            for emotion in emotions
+        )
+        top[sentiment] = [emotion for emotion, _ in counts.most_common(2)] or ["neutral"]
+    return top
+
+def evaluate(model, texts, sentiments, intensities):
+    """Report agreement with the LLM labels"""
+    if not texts:
+        return {}
+    probabilities, predicted_intensities = model.predict(texts)
+    predicted = [SENTIMENTS[i] for i in probabilities.argmax(axis=1)]
+    agreement = np.mean([p == s for p, s in zip(predicted, sentiments)])
+    per_class = {}
+    for sentiment in SENTIMENTS:
+        support = [p for p, s in zip(predicted, sentiments) if s == sentiment]
+        if support:
+            per_class[sentiment] = round(float(np.mean([p == sentiment for p in support])), 3)
+    return {
+        "held_out": len(texts),
+        "agreement": round(float(agreement), 3),
+        "per_class_recall": per_class,
+        "intensity_mae": round(float(np.mean(np.abs(predicted_intensities - np.asarray(intensities)))), 2)
+    }
+
+def train_from_cache(cache_path, output_path, test_size=0.2, model_name=None, epochs=8, seed=0):
+    """Train a classifier from cached Gemini results and save it"""
+    from result_cache import ResultCache
+
+    cache = ResultCache(cache_path)
+    rows = [
+        (text, result) for text, result in cache.iter_labeled(model_name)
+        if result.get("sentiment") in SENTIMENTS
+    ]
+    if len(rows) < 10:
+        raise ValueError(f"Need at least 10 cached results to train, found {len(rows)}")
+
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(rows))
+    split = int(len(rows) * (1 - test_size))
+    train = [rows[i] for i in order[:split]]
+    test = [rows[i] for i in order[split:]]
+
+    def columns(subset):
+        return (
+            [text for text, _ in subset],
+            [result["sentiment"] for _, result in subset],
+            [result.get("intensity", 5) for _, result in subset],
+            [result.get("emotions", []) for _, result in subset]
+        )
+
+    train_texts, train_sentiments, train_intensities, train_emotions = columns(train)
+    model = LocalClassifier()
+    model.fit(train_texts, train_sentiments, train_intensities, epochs=epochs, seed=seed)
+    model.emotions = _top_emotions(train_sentiments, train_emotions)
+    model.save(output_path)
+
+    test_texts, test_sentiments, test_intensities, _ = columns(test)
+    report = evaluate(model, test_texts, test_sentiments, test_intensities)
+    report["trained_on"] = len(train)
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the local sentiment classifier from cached Gemini results")
+    parser.add_argument("--cache", default=None, help="Result cache path (default: SENTIMENT_CACHE_PATH or .sentiment_cache.sqlite3)")
+    parser.add_argument("--output", default="local_model.npz", help="Where to save the model")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Held-out share for the agreement report")
+    parser.add_argument("--model-name", default=None, help="Only use results from this Gemini model")
+    parser.add_argument("--epochs", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    report = train_from_cache(args.cache, args.output, args.test_size, args.model_name, args.epochs)
+    print(json.dumps(report, indent=2))
+    print(f"Model saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+from batch_packer import estimate_tokens
+from wire_format import encode_compact_items
+
+DEFAULT_MODEL_NAME = 'gemini-1.5-flash'
+
+class GenerationResult:
+    """Text returned by a backend plus token accounting"""
+
+    def __init__(self, text, input_tokens=0, output_tokens=0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+class ModelBackend:
+    """Interface every text generation backend implements"""
+
+    model_name = None
+
+    def generate(self, prompt):
+        """Return a GenerationResult for the prompt"""
+        raise NotImplementedError
+
+    def generate_stream(self, prompt):
+        """Yield the answer text in pieces as it is produced"""
+        # Backends without native streaming deliver the whole answer at once
+        yield self.generate(prompt).text
+
+class GeminiBackend(ModelBackend):
+    """Backend calling the Google Gemini API"""
+
+    def __init__(self, api_key=None, model_name=DEFAULT_MODEL_NAME, dedicated_client=False):
+        api_key = api_key or os.getenv("GEMINI_API_KEY")
+        if api_key:
+            self.api_key = api_key
+            self.model_name = model_name
+            self.dedicated_client = dedicated_client
+            self._model = None
+            self._model_lock = threading.Lock()
+        else:
+            raise ValueError("GEMINI_API_KEY not found")
+
+    @property
+    def model(self):
+        """Gemini model handle, created on the first request"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # Imported here so startup and the mock backend do not pay for the Google client
+                    import google.generativeai as genai
+
+                    model = genai.GenerativeModel(self.model_name)
+                    if self.dedicated_client:
+                        # A client of its own instead of the process-wide one set by
+                        # genai.configure, so several keys can be used side by side
+                        import google.ai.generativelanguage as glm
+                        model._client = glm.GenerativeServiceClient(client_options={"api_key": self.api_key})
+                    else:
+                        genai.configure(api_key=self.api_key)
+                    self._model = model
+        return self._model
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        try:
+            text = response.text
+        except ValueError:
+            # Blocked or empty candidates have no text; treat as an unusable answer
+            text = ""
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            return GenerationResult(text, usage.prompt_token_count, usage.candidates_token_count)
+        return GenerationResult(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    def generate_stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # A chunk without candidates carries no text
+                continue
+            if text:
+                yield text
+
+class MockServiceError(Exception):
+    """Injected failure that looks like a transient 503 from the API"""
+
+    code = 503
+
+class MockBackend(ModelBackend):
+    """Offline backend with configurable latency, failures and broken output"""
+
+    POSITIVE_WORDS = ["good", "great", "excellent", "amazing", "love", "best", "wonderful", "fantastic", "happy"]
+    NEGATIVE_WORDS = ["bad", "terrible", "awful", "hate", "worst", "horrible", "disappointing", "broke", "poor"]
+
+    def __init__(self, latency=0.0, latency_distribution="constant", latency_sigma=0.5,
+                 error_rate=0.0, malformed_rate=0.0, truncated_rate=0.0, seed=None,
+                 model_name="mock", seconds_per_output_token=0.0):
+        self.latency = latency
+        # Simulates decoding time, which grows with the length of the answer
+        self.seconds_per_output_token = seconds_per_output_token
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.truncated_rate = truncated_rate
+        self.model_name = model_name
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.malformed = 0
+        self.truncated = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def sample_latency(self):
+        """Draw one latency in seconds from the configured distribution"""
+        if self.latency <= 0:
+            return 0.0
+        with self._lock:
+            if self.latency_distribution == "uniform":
+                return self._random.uniform(0, 2 * self.latency)
+            if self.latency_distribution == "exponential":
+                return self._random.expovariate(1.0 / self.latency)
+            if self.latency_distribution == "lognormal":
+                # Median equals `latency`; sigma controls how heavy the tail is
+                return self._random.lognormvariate(math.log(self.latency), self.latency_sigma)
+        return self.latency
+
+    def generate(self, prompt):
+        text = self._respond(prompt)
+        if self.seconds_per_output_token:
+            time.sleep(estimate_tokens(text) * self.seconds_per_output_token)
+        return GenerationResult(text, estimate_tokens(prompt), estimate_tokens(text))
+
+    def generate_stream(self, prompt, chunk_chars=64):
+        text = self._respond(prompt)
+        for start in range(0, len(text), chunk_chars):
+            chunk = text[start:start + chunk_chars]
+            # Decoding time is spread over the chunks instead of paid up front
+            if self.seconds_per_output_token:
+                time.sleep(estimate_tokens(chunk) * self.seconds_per_output_token)
+            yield chunk
+
+    def _respond(self, prompt):
+        """Wait the sampled latency, then return the answer text or raise an injected failure"""
+        time.sleep(self.sample_latency())
+
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += estimate_tokens(prompt)
+            roll = self._random.random()
+            if roll < self.error_rate:
+                self.errors += 1
+                raise MockServiceError("503 Mock service unavailable")
+
+        text = self.build_response(prompt)
+        roll -= self.error_rate
+
+        with self._lock:
+            if roll < self.malformed_rate:
+                self.malformed += 1
+                text = "Sorry, I could not produce JSON for that request."
+            elif roll < self.malformed_rate + self.truncated_rate:
+                self.truncated += 1
+                text = text[:self._random.randint(1, max(1, len(text) - 1))]
+            self.output_tokens += estimate_tokens(text)
+        return text
+
+    def build_response(self, prompt):
+        """Build a well-formed answer for the prompt formats the analyzer sends"""
+        # Only the compact prompt ends with its texts, as T=[...]
+        compact_match = re.search(r'\nT=(\[.*\])$', prompt, re.DOTALL)
+        if compact_match:
+            texts = json.loads(compact_match.group(1))
+            return encode_compact_items([dict(self.score(text), id=i) for i, text in enumerate(texts)])
+
+        batch_match = re.search(r'Texts: (\[.*?\])\s*\n', prompt, re.DOTALL)
+        if batch_match:
+            items = json.loads(batch_match.group(1))
+            results = [dict(self.score(item["text"]), id=item["id"]) for item in items]
+            return "```json\n" + json.dumps(results, indent=2) + "\n```"
+
+        single_match = re.search(r'Text: "(.*)"\s*\n\s*Return', prompt, re.DOTALL)
+        if single_match:
+            return json.dumps(self.score(single_match.group(1)))
+
+        return "OK"
+
+    def score(self, text):
+        """Deterministic keyword sentiment used for mock answers"""
+        words = re.findall(r"[a-z']+", text.lower())
+        positive = sum(1 for word in words if word in self.POSITIVE_WORDS)
+        negative = sum(1 for word in words if word in self.NEGATIVE_WORDS)
+
+        if positive > negative:
+            sentiment, emotions = "positive", ["happy"]
+        elif negative > positive:
+            sentiment, emotions = "negative", ["angry"]
+        else:
+            sentiment, emotions = "neutral", ["neutral"]
+
+        margin = abs(positive - negative)
+        return {
+            "sentiment": sentiment,
+            "confidence": round(min(0.95, 0.6 + 0.1 * margin), 2),
+            "emotions": emotions,
+            "key_phrases": words[:3],
+            "intensity": min(10, 4 + 2 * margin)
+        }
+
+    def get_stats(self):
+        """Return call, failure and token counters"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "malformed": self.malformed,
+                "truncated": self.truncated,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens
+            }
+
+def create_backend():
+    """Build the backend selected by the SENTIMENT_BACKEND environment variable"""
+    backend_name = os.getenv("SENTIMENT_BACKEND", "gemini").lower()
+    if backend_name == "mock":
+        return MockBackend(latency=float(os.getenv("SENTIMENT_MOCK_LATENCY", "0")))
+    if backend_name == "gemini":
+        if os.getenv("GEMINI_API_KEYS"):
+            from backend_pool import create_gemini_pool
+            return create_gemini_pool()
+        return GeminiBackend()
+    raise ValueError(f"Unknown SENTIMENT_BACKEND: {backend_name}")
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from result_cache import DEFAULT_CACHE_PATH
+
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+def _to_signed(value):
+    """Map an unsigned 64-bit int onto SQLite's signed INTEGER range"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def simhash(text, shingle_size=4):
+    """64-bit SimHash over character shingles of the case- and punctuation-folded text"""
+    folded = _NON_ALNUM_RE.sub(" ", text.lower()).strip()
+    if len(folded) < shingle_size:
+        shingles = [folded] if folded else []
+    else:
+        shingles = [folded[i:i + shingle_size] for i in range(len(folded) - shingle_size + 1)]
+    if not shingles:
+        return None
+
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(len(shingles), 64)
+    # Each bit is set when most shingles vote for it
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes).tobytes(), "big")
+
+class NearDuplicateIndex:
+    """Persistent SimHash LSH index of analyzed texts and their results"""
+
+    def __init__(self, path=None, threshold=0.95, shingle_size=4):
+        self.path = path or os.getenv("SENTIMENT_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        # Pigeonhole: with max_distance + 1 bands, any match within the threshold
+        # shares at least one identical band
+        self.max_distance = int(round((1 - threshold) * 64))
+        self.bands = min(64, self.max_distance + 1)
+        self.band_bits = 64 // self.bands
+
+        self.reused = 0
+        self.lookups = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        if self.path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS lsh_entries (
+                id INTEGER PRIMARY KEY,
+                simhash INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS lsh_bands (
+                band_bits INTEGER NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                entry_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS lsh_bands_lookup ON lsh_bands (band_bits, band, bucket);
+        """)
+        self._conn.commit()
+
+    def _band_keys(self, signature):
+        """Split a signature into (band, bucket) pairs"""
+        mask = (1 << self.band_bits) - 1
+        return [(band, (signature >> (band * self.band_bits)) & mask) for band in range(self.bands)]
+
+    def similarity(self, first, second):
+        """Share of identical bits between two signatures"""
+        return 1 - bin(first ^ second).count("1") / 64
+
+    def find_many(self, texts, model_name, prompt_version):
+        """Return (result, similarity) for the closest stored match of each text, or None"""
+        matches = []
+        with self._lock:
+            for text in texts:
+                self.lookups += 1
+                signature = simhash(text, self.shingle_size)
+                match = None
+                if signature is not None:
+                    match = self._find(signature, model_name, prompt_version)
+                if match is not None:
+                    self.reused += 1
+                matches.append(match)
+        return matches
+
+    def _find(self, signature, model_name, prompt_version):
+        best = None
+        seen = set()
+        for band, bucket in self._band_keys(signature):
+            rows = self._conn.execute(
+                """
+                SELECT e.id, e.simhash, e.result FROM lsh_bands b
+                JOIN lsh_entries e ON e.id = b.entry_id
+                WHERE b.band_bits = ? AND b.band = ? AND b.bucket = ?
+                  AND e.model = ? AND e.prompt_version = ?
+                """,
+                (self.band_bits, band, bucket, model_name, prompt_version)
+            ).fetchall()
+            for entry_id, stored, result in rows:
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                score = self.similarity(signature, stored & ((1 << 64) - 1))
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (json.loads(result), score)
+        return best
+
+    def add_many(self, items, model_name, prompt_version):
+        """Index (text, result) pairs"""
+        with self._lock:
+            for text, result in items:
+                signature = simhash(text, self.shingle_size)
+                if signature is None:
+                    continue
+                cursor = self._conn.execute(
+                    "INSERT INTO lsh_entries (simhash, model, prompt_version, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (_to_signed(signature), model_name, prompt_version, json.dumps(result), time.time())
+                )
+                self._conn.executemany(
+                    "INSERT INTO lsh_bands VALUES (?, ?, ?, ?)",
+                    [(self.band_bits, band, bucket, cursor.lastrowid) for band, bucket in self._band_keys(signature)]
+                )
+            self._conn.commit()
+
+    def get_stats(self):
+        """Return reuse counters for this process"""
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "lookups": self.lookups,
+                "reused": self.reused,
+                "reuse_rate": round(self.reused / self.lookups, 3) if self.lookups else 0.0
+            }
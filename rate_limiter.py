@@ -0,0 +1,87 @@
+import threading
+import time
+
+class TokenBucket:
+    """Token bucket refilled continuously up to its capacity"""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.available = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now):
+        """Add the budget earned since the last refill"""
+        elapsed = now - self.updated_at
+        self.available = min(self.capacity, self.available + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount):
+        """Seconds until the bucket holds the requested amount"""
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.refill_per_second
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by all threads"""
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=1000000):
+        if requests_per_minute <= 0 or tokens_per_minute <= 0:
+            raise ValueError("Rate limits must be positive")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # Below 1 RPM the bucket must still hold one whole request, or acquire never returns
+        self._requests = TokenBucket(max(1.0, requests_per_minute), requests_per_minute / 60.0)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._condition = threading.Condition()
+
+        self.acquired = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+
+    def acquire(self, tokens=1):
+        """Block until one request and the given tokens fit the budget"""
+        # A single oversized call would otherwise wait forever
+        tokens = min(float(tokens), self._tokens.capacity)
+        started = time.monotonic()
+
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                self._requests.refill(now)
+                self._tokens.refill(now)
+                delay = max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+                if delay <= 0:
+                    break
+                self._condition.wait(delay)
+
+            self._requests.available -= 1
+            self._tokens.available -= tokens
+
+            waited = time.monotonic() - started
+            self.acquired += 1
+            if waited > 0.001:
+                self.waits += 1
+                self.total_wait_seconds += waited
+
+        return waited
+
+    def estimated_wait(self, tokens=1):
+        """Seconds acquire would currently block for, without taking any budget"""
+        tokens = min(float(tokens), self._tokens.capacity)
+        with self._condition:
+            now = time.monotonic()
+            self._requests.refill(now)
+            self._tokens.refill(now)
+            return max(self._requests.wait_time(1), self._tokens.wait_time(tokens))
+
+    def get_stats(self):
+        """Return how often and how long callers queued for budget"""
+        with self._condition:
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "tokens_per_minute": self.tokens_per_minute,
+                "acquired": self.acquired,
+                "queued": self.waits,
+                "total_wait_seconds": round(self.total_wait_seconds, 2)
+            }
@@ -0,0 +1,312 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# HTTP status codes that usually clear up on their own
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+TRANSIENT_ERROR_NAMES = {
+    "ServiceUnavailable",
+    "TooManyRequests",
+    "ResourceExhausted",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "GatewayTimeout",
+    "BadGateway",
+    "Aborted"
+}
+
+def is_transient_error(error):
+    """Return True when an error is worth retrying"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    # google.api_core exceptions expose the HTTP status as `code`
+    code = getattr(error, "code", None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES
+
+def is_quota_error(error):
+    """Return True when an error means the caller's quota is used up"""
+    if getattr(error, "code", None) == 429:
+        return True
+    return type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the circuit breaker is open"""
+
+class RetryPolicy:
+    """Retry transient errors with exponential backoff and full jitter"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, classifier=is_transient_error):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.classifier = classifier
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt):
+        """Seconds to sleep before the given retry attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func):
+        """Call func, retrying transient failures"""
+        for attempt in range(self.max_attempts):
+            try:
+                return func()
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not self.classifier(e):
+                    raise
+                with self._lock:
+                    self.retries += 1
+                time.sleep(self.backoff(attempt))
+
+class CircuitBreaker:
+    """Stop calling a failing service and probe it for recovery in the background"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, probe=None):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe = probe
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    @property
+    def is_open(self):
+        """True while calls are being refused"""
+        with self._lock:
+            if self.state == self.OPEN and self.probe is None:
+                # Without a probe, let traffic through again once the timeout passes
+                if time.monotonic() - self.opened_at >= self.recovery_timeout:
+                    self.state = self.CLOSED
+                    self.consecutive_failures = self.failure_threshold - 1
+            return self.state == self.OPEN
+
+    def call(self, func):
+        """Call func unless the breaker is open"""
+        if self.is_open:
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError("Circuit breaker is open")
+
+        try:
+            result = func()
+        except Exception:
+            self.record_failure()
+            raise
+
+        self.record_success()
+        return result
+
+    def record_success(self):
+        """Reset the failure count after a successful call"""
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        """Count a failure and trip the breaker once the threshold is reached"""
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.OPEN or self.consecutive_failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+            if self.probe is not None and (self._probe_thread is None or not self._probe_thread.is_alive()):
+                self._probe_thread = threading.Thread(target=self._probe_until_recovered, daemon=True)
+                self._probe_thread.start()
+
+    def _probe_until_recovered(self):
+        """Background loop that closes the breaker once a probe call succeeds"""
+        while True:
+            time.sleep(self.recovery_timeout)
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"Circuit breaker probe failed: {e}")
+                continue
+
+            with self._lock:
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+                self.opened_at = None
+            return
+
+    def get_stats(self):
+        """Return breaker state and counters"""
+        with self._lock:
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "rejected_calls": self.rejected,
+                "consecutive_failures": self.consecutive_failures
+            }
+
+class LatencyTracker:
+    """Keep a sliding window of recent call latencies"""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Add one observed latency"""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """Return the pct-th percentile of the window, or None until enough samples exist"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+# Marks a stream that ended before yielding anything
+_END_OF_STREAM = object()
+
+class HedgePolicy:
+    """Send a duplicate of a slow call and keep whichever answer arrives first
+
+    Streamed calls are hedged on their time to first chunk instead, then
+    read only from the copy that started streaming first.
+    """
+
+    def __init__(self, percentile=95, budget=0.1, window=200, min_samples=20, max_workers=16):
+        # Calls still running at this latency percentile get a hedge
+        self.percentile = percentile
+        # Hedges may add at most this fraction of extra calls
+        self.budget = budget
+        self.tracker = LatencyTracker(window, min_samples)
+        self.first_chunk_tracker = LatencyTracker(window, min_samples)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedge_losses = 0
+        self.budget_denied = 0
+
+    def call(self, func, hedge_func=None):
+        """Call func, hedging with hedge_func (or func again) once it runs slow"""
+        with self._lock:
+            self.calls += 1
+        delay = self.tracker.percentile(self.percentile)
+
+        primary = self._executor.submit(self._timed, func)
+        if delay is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._take_budget():
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed, hedge_func or func)
+        # The slower copy keeps running; its answer is discarded
+        return self._race(primary, hedge).result()
+
+    def call_stream(self, open_stream, hedge_open=None):
+        """Yield the chunks of open_stream(), hedging once the first chunk runs late"""
+        with self._lock:
+            self.calls += 1
+        delay = self.first_chunk_tracker.percentile(self.percentile)
+
+        winner = primary = self._executor.submit(self._first_chunk, open_stream)
+        if delay is not None:
+            done, _ = wait([primary], timeout=delay)
+            if not done and self._take_budget():
+                hedge = self._executor.submit(self._first_chunk, hedge_open or open_stream)
+                winner = self._race(primary, hedge)
+                # Stop the other copy as soon as it has started, since only one is read
+                loser = hedge if winner is primary else primary
+                loser.add_done_callback(self._close_stream)
+
+        stream, first = winner.result()
+        if first is _END_OF_STREAM:
+            return
+        yield first
+        yield from stream
+
+    def _race(self, primary, hedge):
+        """Return the first of the two futures to succeed, or a failed one if both fail"""
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: f.exception() is not None):
+                if future.exception() is not None and pending:
+                    # One copy failed; the other may still answer
+                    continue
+                with self._lock:
+                    if future is hedge:
+                        self.hedge_wins += 1
+                    else:
+                        self.hedge_losses += 1
+                return future
+
+    def _first_chunk(self, open_stream):
+        """Open a stream and wait for its first chunk, recording how long that took"""
+        started = time.monotonic()
+        stream = iter(open_stream())
+        first = next(stream, _END_OF_STREAM)
+        self.first_chunk_tracker.record(time.monotonic() - started)
+        return stream, first
+
+    @staticmethod
+    def _close_stream(future):
+        if future.exception() is None:
+            stream, _ = future.result()
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
+    def _timed(self, func):
+        """Run func and record its latency when it succeeds"""
+        started = time.monotonic()
+        result = func()
+        self.tracker.record(time.monotonic() - started)
+        return result
+
+    def _take_budget(self):
+        """Reserve one hedge if the extra volume stays within the budget"""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.calls:
+                self.budget_denied += 1
+                return False
+            self.hedges += 1
+            return True
+
+    def get_stats(self):
+        """Return hedge counters and the current hedge delay"""
+        delay = self.tracker.percentile(self.percentile)
+        first_chunk_delay = self.first_chunk_tracker.percentile(self.percentile)
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_losses": self.hedge_losses,
+                "budget_denied": self.budget_denied,
+                "hedge_rate": round(self.hedges / self.calls, 3) if self.calls else 0.0,
+                "hedge_delay_seconds": round(delay, 3) if delay is not None else None,
+                "first_chunk_delay_seconds": round(first_chunk_delay, 3) if first_chunk_delay is not None else None
+            }
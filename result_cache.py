@@ -0,0 +1,132 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from text_utils import normalize_text, text_fingerprint
+
+DEFAULT_CACHE_PATH = ".sentiment_cache.sqlite3"
+
+class ResultCache:
+    """Disk-backed cache of validated analysis results keyed by text hash"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("SENTIMENT_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._lock = threading.Lock()
+
+        # One connection shared by every thread; access is serialized by the lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        if self.path != ":memory:":
+            # WAL lets several Streamlit worker processes read while one writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                prompt_version TEXT NOT NULL,
+                text TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def make_key(self, text, model_name, prompt_version):
+        """Build the cache key for a text under a given model and prompt"""
+        return text_fingerprint(text, model_name, prompt_version)
+
+    def get_many(self, texts, model_name, prompt_version):
+        """Look up several texts at once, returning None for every miss"""
+        keys = [self.make_key(text, model_name, prompt_version) for text in texts]
+        found = {}
+
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            unique_keys = list(dict.fromkeys(keys))
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, result FROM results WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+
+            results = []
+            for key in keys:
+                if key in found:
+                    self.hits += 1
+                    results.append(json.loads(found[key]))
+                else:
+                    self.misses += 1
+                    results.append(None)
+
+        return results
+
+    def get(self, text, model_name, prompt_version):
+        """Look up a single text"""
+        return self.get_many([text], model_name, prompt_version)[0]
+
+    def put_many(self, items, model_name, prompt_version):
+        """Store (text, result) pairs"""
+        rows = [
+            (
+                self.make_key(text, model_name, prompt_version),
+                model_name,
+                prompt_version,
+                normalize_text(text),
+                json.dumps(result),
+                time.time()
+            )
+            for text, result in items
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+            self.writes += len(rows)
+
+    def put(self, text, result, model_name, prompt_version):
+        """Store a single result"""
+        self.put_many([(text, result)], model_name, prompt_version)
+
+    def iter_labeled(self, model_name=None):
+        """Yield (normalized text, result) for every stored result"""
+        query = "SELECT text, result FROM results"
+        params = ()
+        if model_name:
+            query += " WHERE model = ?"
+            params = (model_name,)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        for text, result in rows:
+            yield text, json.loads(result)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self):
+        """Remove every cached result"""
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+
+    def get_stats(self):
+        """Return hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
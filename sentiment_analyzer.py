@@ -1,133 +1,748 @@
-import google.generativeai as genai
-import os
+import asyncio
+import itertools
 import json
+import os
 import re
+import threading
+from collections import Counter
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from dotenv import load_dotenv
-
-load_dotenv()
+from batch_packer import BatchPacker, estimate_tokens
+from lexicon_scorer import LexiconScorer
+from model_backends import create_backend
+from rate_limiter import RateLimiter
+from resilience import CircuitBreaker, CircuitOpenError, HedgePolicy, RetryPolicy
+from result_cache import ResultCache
+from single_flight import SingleFlight
+from streaming_json import IncrementalJSONParser
+from text_chunker import chunk_text, merge_chunk_results
+from text_utils import collapse_duplicates, fan_out, text_fingerprint
+from wire_format import build_compact_prompt, decode_compact_row, parse_compact_response
 
 class SentimentAnalyzer:
-    def __init__(self):
-        api_key = os.getenv("GEMINI_API_KEY")
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-1.5-flash')
+    # Bump whenever a prompt changes so stale cached results are not reused
+    PROMPT_VERSION = "1"
+
+    def __init__(self, backend=None, cache=None, use_cache=True, max_concurrency=4, packer=None,
+                 requests_per_minute=None, tokens_per_minute=None,
+                 retry_policy=None, circuit_breaker=None, lexicon_scorer=None,
+                 cascade_threshold=None, local_scorer=None, local_model_path=None,
+                 near_duplicate_threshold=None, chunk_chars=None, protocol=None, hedge_policy=None):
+        # Read .env when the analyzer is built rather than when the module is imported
+        from dotenv import load_dotenv
+        load_dotenv()
+        
+        # Gemini by default; tests and benchmarks can pass a MockBackend
+        self.backend = backend if backend is not None else create_backend()
+        self.model_name = self.backend.model_name
+        
+        # Results are shared through disk by every session and survive restarts
+        if use_cache:
+            self.cache = cache if cache is not None else ResultCache()
         else:
-            raise ValueError("GEMINI_API_KEY not found")
+            self.cache = None
+        
+        # Number of batch requests kept in flight by analyze_batch
+        self.max_concurrency = max(1, int(max_concurrency))
+        
+        # "compact" trades the readable JSON protocol for short codes and no whitespace
+        protocol = protocol or os.getenv("SENTIMENT_PROTOCOL", "verbose")
+        if protocol not in ("verbose", "compact"):
+            raise ValueError(f"Unknown protocol: {protocol}")
+        self.protocol = protocol
+        self.prompt_version = self.PROMPT_VERSION if protocol == "verbose" else f"{self.PROMPT_VERSION}-compact"
+        
+        # Batches are sized by estimated tokens rather than a fixed count
+        if packer is None:
+            packer = BatchPacker(output_tokens_per_item=20) if protocol == "compact" else BatchPacker()
+        self.packer = packer
+        
+        # One budget for every session and thread, since the analyzer is a
+        # process-wide st.cache_resource singleton; a key pool brings its combined quota
+        if requests_per_minute is None and os.getenv("SENTIMENT_REQUESTS_PER_MINUTE"):
+            requests_per_minute = float(os.getenv("SENTIMENT_REQUESTS_PER_MINUTE"))
+        if tokens_per_minute is None and os.getenv("SENTIMENT_TOKENS_PER_MINUTE"):
+            tokens_per_minute = float(os.getenv("SENTIMENT_TOKENS_PER_MINUTE"))
+        if requests_per_minute is None:
+            requests_per_minute = getattr(self.backend, "requests_per_minute", 60)
+        if tokens_per_minute is None:
+            tokens_per_minute = getattr(self.backend, "tokens_per_minute", 1000000)
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        
+        # Transient errors are retried; repeated failures open the breaker
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(probe=self._probe_model)
+        self.circuit_breaker = circuit_breaker
+        
+        # Hedging: a batch call still running at this latency percentile gets a duplicate
+        if hedge_policy is None and os.getenv("SENTIMENT_HEDGE_PERCENTILE"):
+            hedge_policy = HedgePolicy(
+                percentile=float(os.getenv("SENTIMENT_HEDGE_PERCENTILE")),
+                budget=float(os.getenv("SENTIMENT_HEDGE_BUDGET", "0.1"))
+            )
+        self.hedge_policy = hedge_policy
+        
+        # Near-identical texts can reuse a stored result; off unless a threshold is set
+        if near_duplicate_threshold is None and os.getenv("SENTIMENT_NEAR_DUPLICATE_THRESHOLD"):
+            near_duplicate_threshold = float(os.getenv("SENTIMENT_NEAR_DUPLICATE_THRESHOLD"))
+        self.near_duplicate_index = None
+        if near_duplicate_threshold is not None and self.cache is not None:
+            # Imported only when enabled, since it loads numpy
+            from near_duplicate_index import NearDuplicateIndex
+            self.near_duplicate_index = NearDuplicateIndex(self.cache.path, threshold=near_duplicate_threshold)
+        
+        # Chunking mode: documents longer than this are split at sentence boundaries
+        if chunk_chars is None and os.getenv("SENTIMENT_CHUNK_CHARS"):
+            chunk_chars = int(os.getenv("SENTIMENT_CHUNK_CHARS"))
+        self.chunk_chars = chunk_chars
+        
+        # Local scorer used whenever the model cannot answer
+        self.lexicon_scorer = lexicon_scorer if lexicon_scorer is not None else LexiconScorer()
+        
+        # Cascade mode: texts whose local margin reaches the threshold skip Gemini
+        self.cascade_threshold = cascade_threshold
+        # A classifier distilled from past Gemini labels beats the lexicon when available
+        local_model_path = local_model_path or os.getenv("SENTIMENT_LOCAL_MODEL")
+        if local_scorer is None and local_model_path and os.path.exists(local_model_path):
+            from local_classifier import LocalClassifier
+            local_scorer = LocalClassifier.load(local_model_path)
+        self.local_scorer = local_scorer if local_scorer is not None else self.lexicon_scorer
+        
+        # Texts being analyzed right now, so concurrent sessions wait instead of resending
+        self._in_flight = SingleFlight()
+        
+        # Counters shared by every session using this analyzer
+        self._counters = Counter()
+        self._counters_lock = threading.Lock()
     
-    def analyze_single_text(self, text):
-        """Analyze sentiment of a single text"""
-        try:
-            prompt = f"""
-            Analyze the sentiment of the following text and return ONLY a JSON response:
+    def analyze_single_text(self, text, cascade_threshold=None):
+        """Analyze sentiment of a single text
+        
+        Runs through the same tiers as a batch: cache, near-duplicate reuse,
+        the local cascade, then the model, coalesced with identical texts
+        other sessions are already sending.
+        """
+        return self.analyze_batch([text], cascade_threshold=cascade_threshold)[0]
+    
+    def analyze_batch(self, texts, cascade_threshold=None, on_result=None):
+        """Analyze multiple texts efficiently
+        
+        When on_result is given, model answers are streamed and on_result(index, result)
+        is called on the caller's thread as soon as each input row is ready.
+        """
+        return self._run_sync(self.analyze_batch_async(
+            texts, cascade_threshold=cascade_threshold, on_result=on_result
+        ))
+    
+    def analyze_stream(self, texts, window=2000, cascade_threshold=None, on_result=None):
+        """Analyze an iterable of texts window by window, yielding each result in order
+        
+        Only one window of texts and results is held at a time, so any number of
+        texts can be analyzed; pair with SummaryAccumulator for the totals.
+        Sequences such as a LineIndex are sliced by index instead of iterated.
+        """
+        offset = 0
+        iterator = None if isinstance(texts, Sequence) else iter(texts)
+        while True:
+            if iterator is None:
+                batch = list(texts[offset:offset + window])
+            else:
+                batch = list(itertools.islice(iterator, window))
+            if not batch:
+                return
             
-            Text: "{text}"
+            batch_on_result = None
+            if on_result is not None:
+                def batch_on_result(index, result, offset=offset):
+                    on_result(offset + index, result)
             
-            Return exactly this JSON format:
-            {{
-                "sentiment": "positive" or "negative" or "neutral",
-                "confidence": confidence_score_0_to_1,
-                "emotions": ["happy", "sad", "angry", "excited", "neutral"],
-                "key_phrases": ["important", "phrases", "from", "text"],
-                "intensity": intensity_score_1_to_10
-            }}
+            yield from self.analyze_batch(batch, cascade_threshold=cascade_threshold, on_result=batch_on_result)
+            offset += len(batch)
+    
+    async def analyze_batch_async(self, texts, max_concurrency=None, cascade_threshold=None, on_result=None):
+        """Analyze multiple texts with several batch requests in flight at once"""
+        # Each distinct text is analyzed once and its result fanned out to every copy
+        all_texts = texts
+        texts, positions = collapse_duplicates(all_texts)
+        if len(texts) < len(all_texts):
+            self._increment("duplicates_collapsed", len(all_texts) - len(texts))
+        
+        emit = None
+        if on_result is not None:
+            rows = [[] for _ in texts]
+            for row, index in enumerate(positions):
+                rows[index].append(row)
             
-            Rules:
-            - sentiment must be exactly "positive", "negative", or "neutral"
-            - confidence must be a number between 0 and 1
-            - emotions should be relevant emotions detected
-            - key_phrases should be 3-5 important words/phrases
-            - intensity should be 1-10 (1=very mild, 10=very strong)
-            """
+            def emit(index, result):
+                copies = fan_out([result], [0] * len(rows[index]), [all_texts[row] for row in rows[index]])
+                for row, copy in zip(rows[index], copies):
+                    on_result(row, copy)
+        
+        if self.chunk_chars:
+            results = await self._analyze_chunked(texts, max_concurrency, cascade_threshold, emit)
+        else:
+            results = await self._analyze_distinct(texts, max_concurrency, cascade_threshold, emit)
+        
+        results = fan_out(results, positions, all_texts)
+        self._count_tiers(results)
+        return results
+    
+    async def _analyze_chunked(self, texts, max_concurrency, cascade_threshold, emit=None):
+        """Split long documents, analyze every piece together, then merge per document"""
+        pieces = []
+        spans = []
+        owners = []
+        for document, text in enumerate(texts):
+            chunks = chunk_text(text, self.chunk_chars) if len(text) > self.chunk_chars else [text]
+            spans.append((len(pieces), len(pieces) + len(chunks)))
+            owners.extend([document] * len(chunks))
+            pieces.extend(chunks)
+        
+        if len(pieces) > len(texts):
+            self._increment("chunks_analyzed", len(pieces) - len(texts))
+        
+        # Documents often share pieces (boilerplate, quoted text); each is analyzed once
+        distinct_pieces, piece_positions = collapse_duplicates(pieces)
+        if len(distinct_pieces) < len(pieces):
+            self._increment("duplicates_collapsed", len(pieces) - len(distinct_pieces))
+        
+        def merge(document, piece_results):
+            start, end = spans[document]
+            if end - start == 1:
+                return piece_results[start]
+            return merge_chunk_results(
+                piece_results[start:end], [len(piece) for piece in pieces[start:end]], texts[document]
+            )
+        
+        merged = [None] * len(texts)
+        emit_piece = None
+        if emit is not None:
+            # A document is reported once its last piece has arrived
+            streamed = [None] * len(pieces)
+            remaining = [end - start for start, end in spans]
             
-            response = self.model.generate_content(prompt)
-            result_text = response.text.strip()
+            def emit_piece(index, result):
+                streamed[index] = result
+                document = owners[index]
+                remaining[document] -= 1
+                if remaining[document] == 0:
+                    merged[document] = merge(document, streamed)
+                    emit(document, merged[document])
+        
+        emit_distinct = None
+        if emit_piece is not None:
+            piece_rows = [[] for _ in distinct_pieces]
+            for index, distinct in enumerate(piece_positions):
+                piece_rows[distinct].append(index)
             
-            # Extract JSON from response
-            json_match = re.search(r'\{.*\}', result_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                result = json.loads(json_str)
-                
-                # Validate and clean result
-                result = self.validate_result(result, text)
-                return result
-            else:
-                return self.fallback_analysis(text)
-                
-        except Exception as e:
-            print(f"Error analyzing text: {e}")
-            return self.fallback_analysis(text)
+            def emit_distinct(distinct, result):
+                rows = piece_rows[distinct]
+                for index, copy in zip(rows, fan_out([result], [0] * len(rows), [pieces[i] for i in rows])):
+                    emit_piece(index, copy)
+        
+        # Pieces of all documents share the same packed, concurrent batches
+        distinct_results = await self._analyze_distinct(
+            distinct_pieces, max_concurrency, cascade_threshold, emit_distinct
+        )
+        piece_results = fan_out(distinct_results, piece_positions, pieces)
+        
+        return [
+            result if result is not None else merge(document, piece_results)
+            for document, result in enumerate(merged)
+        ]
     
-    def analyze_batch(self, texts):
-        """Analyze multiple texts efficiently"""
-        results = []
+    async def _analyze_distinct(self, texts, max_concurrency, cascade_threshold, emit=None):
+        """Run distinct texts through the cache, reuse, cascade and model tiers"""
+        results = self._lookup_cached(texts)
+        pending = [i for i, result in enumerate(results) if result is None]
         
-        # Process in batches of 5 for efficiency
-        batch_size = 5
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i+batch_size]
-            batch_results = self.analyze_batch_gemini(batch)
-            results.extend(batch_results)
+        if self.near_duplicate_index is not None and pending:
+            pending = self._reuse_near_duplicates(texts, pending, results)
         
+        # Confident local results skip the model entirely
+        if cascade_threshold is None:
+            cascade_threshold = self.cascade_threshold
+        if cascade_threshold is not None and pending:
+            pending = self._apply_cascade(texts, pending, results, cascade_threshold)
+        
+        if emit is not None:
+            for i, result in enumerate(results):
+                if result is not None:
+                    emit(i, result)
+        
+        # Texts another caller is already sending are awaited instead of sent again
+        keys = {i: self._flight_key(texts[i]) for i in pending}
+        claims = self._in_flight.claim_many([keys[i] for i in pending])
+        waiting = [(i, future) for i, (future, leader) in zip(pending, claims) if not leader]
+        pending = [i for i, (_, leader) in zip(pending, claims) if leader]
+        if waiting:
+            self._increment("coalesced_requests", len(waiting))
+        
+        async def wait_for(i, future):
+            try:
+                # Shielded so a cancelled caller cannot cancel the shared future
+                result = self._adopt_result(await asyncio.shield(asyncio.wrap_future(future)), texts[i])
+            except Exception:
+                # The other caller gave up; analyze the text here instead
+                result = (await asyncio.to_thread(self._analyze_uncached, [texts[i]]))[0]
+            results[i] = result
+            if emit is not None:
+                emit(i, result)
+        
+        try:
+            await asyncio.gather(
+                self._analyze_owned(texts, pending, keys, results, max_concurrency, emit),
+                *(wait_for(i, future) for i, future in waiting)
+            )
+        finally:
+            # Never leave waiters hanging on a key this call claimed but did not finish
+            self._in_flight.fail_many(
+                [keys[i] for i in pending], RuntimeError("Abandoned by the analyzing caller")
+            )
+        
+        return results
+    
+    async def _analyze_owned(self, texts, pending, keys, results, max_concurrency, emit):
+        """Send the texts this call is responsible for to the model, in packed concurrent batches"""
+        # Fill each request up to the token budgets
+        pending_texts = [texts[i] for i in pending]
+        batches = self.packer.pack(pending_texts)
+        semaphore = asyncio.Semaphore(max(1, max_concurrency or self.max_concurrency))
+        loop = asyncio.get_running_loop()
+        tasks = []
+        # First exception raised by emit; callbacks run by the loop would otherwise drop it
+        failure = []
+        
+        def deliver(index, result):
+            if failure:
+                return
+            try:
+                emit(index, result)
+            except BaseException as e:
+                failure.append(e)
+                # Batches still queued or running are abandoned
+                for task in tasks:
+                    task.cancel()
+        
+        def analyze_batch(batch, batch_keys, on_item):
+            results = self._analyze_uncached(batch, on_item)
+            # Waiting callers get each result as soon as this batch has it
+            self._in_flight.resolve_many(zip(batch_keys, results))
+            return results
+        
+        async def run_batch(indices):
+            async with semaphore:
+                # The blocking client call runs on a worker thread
+                batch = [pending_texts[j] for j in indices]
+                batch_keys = [keys[pending[j]] for j in indices]
+                on_item = None
+                if emit is not None:
+                    # Hand each streamed item back to the event loop thread
+                    def on_item(k, result):
+                        self._in_flight.resolve(batch_keys[k], result)
+                        if not failure:
+                            loop.call_soon_threadsafe(deliver, pending[indices[k]], result)
+                return await asyncio.to_thread(analyze_batch, batch, batch_keys, on_item)
+        
+        tasks.extend(asyncio.ensure_future(run_batch(indices)) for indices in batches)
+        try:
+            batch_results = await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            if not failure:
+                raise
+        if failure:
+            raise failure[0]
+        
+        # Place each result back at its input position
+        for indices, batch_result in zip(batches, batch_results):
+            for j, result in zip(indices, batch_result):
+                results[pending[j]] = result
+    
+    def _flight_key(self, text):
+        """Key identifying one text under the current model and prompt"""
+        return text_fingerprint(text, self.model_name, self.prompt_version)
+    
+    def _adopt_result(self, result, text):
+        """Copy a result produced for another caller, labelled with this caller's text"""
+        result = dict(result)
+        result["original_text"] = text[:100] + "..." if len(text) > 100 else text
+        return result
+    
+    def analyze_local(self, texts):
+        """Score every text with the local scorer, without any network calls"""
+        results, _ = self.local_scorer.analyze(texts)
+        for result in results:
+            result["tier"] = "local"
+        self._count_tiers(results)
         return results
     
+    def _reuse_near_duplicates(self, texts, pending, results):
+        """Fill in results of near-identical texts and return the indices still unmatched"""
+        try:
+            matches = self.near_duplicate_index.find_many(
+                [texts[i] for i in pending], self.model_name, self.prompt_version
+            )
+        except Exception as e:
+            print(f"Error reading near-duplicate index: {e}")
+            return pending
+        
+        unmatched = []
+        for i, match in zip(pending, matches):
+            if match is None:
+                unmatched.append(i)
+                continue
+            result, similarity = match
+            text = texts[i]
+            result["original_text"] = text[:100] + "..." if len(text) > 100 else text
+            result["tier"] = "near_duplicate"
+            result["similarity"] = round(similarity, 3)
+            results[i] = result
+        return unmatched
+    
+    def _apply_cascade(self, texts, pending, results, threshold):
+        """Fill in confident local results and return the indices still uncertain"""
+        local_results, margins = self.local_scorer.analyze([texts[i] for i in pending])
+        
+        uncertain = []
+        for i, result, margin in zip(pending, local_results, margins):
+            if margin >= threshold:
+                result["tier"] = "local"
+                results[i] = result
+            else:
+                uncertain.append(i)
+        return uncertain
+    
+    def _count_tiers(self, results):
+        """Record which tier produced each result"""
+        tiers = Counter(result.get("tier", "llm") for result in results)
+        with self._counters_lock:
+            for tier, count in tiers.items():
+                self._counters[f"tier_{tier}"] += count
+    
+    def _run_sync(self, coroutine):
+        """Run a coroutine to completion from synchronous code"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        
+        # Already inside an event loop, so use a private loop on another thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+    
     def analyze_batch_gemini(self, texts):
         """Analyze a batch of texts with Gemini"""
+        results = self._lookup_cached(texts)
+        missing = [i for i, result in enumerate(results) if result is None]
+        
+        # Only texts that were never analyzed before reach the model
+        if missing:
+            fresh_results = self._analyze_uncached([texts[i] for i in missing])
+            for i, result in zip(missing, fresh_results):
+                results[i] = result
+        
+        return results
+    
+    def _analyze_uncached(self, texts, on_item=None):
+        """Analyze texts that missed the cache, honouring the circuit breaker"""
+        # While the breaker is open, skip the network entirely
+        if self.circuit_breaker.is_open:
+            self._increment("circuit_open_fallbacks", len(texts))
+            return self._emit_all(self.fallback_batch(texts), on_item)
+        
+        return self._request_batch(texts, on_item=on_item)
+    
+    def _request_batch(self, texts, allow_requery=True, on_item=None):
+        """Send a batch of texts to Gemini, bypassing the cache
+        
+        With on_item, the answer is streamed and on_item(index, result) is called
+        from this thread as each item completes, before the batch returns.
+        """
+        results = [None] * len(texts)
+        failed = False
+        
+        def accept(item):
+            # Match results by id, so missing, extra or reordered items do not shift
+            index = self._reconcile_batch_item(item, texts, results)
+            if index is not None and on_item is not None:
+                on_item(index, results[index])
+        
         try:
-            texts_json = json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)])
-            
-            prompt = f"""
-            Analyze the sentiment of these texts and return ONLY a JSON array:
-            
-            Texts: {texts_json}
-            
-            Return exactly this JSON format:
-            [
-                {{
-                    "id": 0,
-                    "sentiment": "positive" or "negative" or "neutral",
-                    "confidence": confidence_score_0_to_1,
-                    "emotions": ["relevant", "emotions"],
-                    "key_phrases": ["important", "phrases"],
-                    "intensity": intensity_score_1_to_10
-                }},
-                ...
-            ]
-            
-            Rules:
-            - Return analysis for each text with matching id
-            - sentiment must be exactly "positive", "negative", or "neutral"
-            - confidence must be between 0 and 1
-            - intensity must be between 1 and 10
-            """
-            
-            response = self.model.generate_content(prompt)
-            result_text = response.text.strip()
-            
-            # Extract JSON array from response
-            json_match = re.search(r'\[.*\]', result_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                results = json.loads(json_str)
-                
-                # Validate results
-                validated_results = []
-                for i, result in enumerate(results):
-                    if i < len(texts):
-                        validated_result = self.validate_result(result, texts[i])
-                        validated_results.append(validated_result)
-                
-                return validated_results
+            prompt = self._build_batch_prompt(texts)
+            expected_output_tokens = len(texts) * self.packer.output_tokens_per_item
+            if on_item is None:
+                response = self._generate(prompt, expected_output_tokens=expected_output_tokens)
+                for item in self._parse_batch_items(response.text.strip()):
+                    accept(item)
             else:
-                # Fallback to individual analysis
-                return [self.analyze_single_text(text) for text in texts]
+                self._generate_stream(prompt, accept, expected_output_tokens=expected_output_tokens)
                 
+        except CircuitOpenError:
+            failed = True
+            self._increment("circuit_open_fallbacks", results.count(None))
         except Exception as e:
             print(f"Error in batch analysis: {e}")
-            # Fallback to individual analysis
-            return [self.analyze_single_text(text) for text in texts]
+            # Retries are already exhausted, so another request would fail too
+            failed = True
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        
+        if missing and len(missing) < len(texts):
+            self._increment("salvaged_items", len(texts) - len(missing))
+        
+        valid = [(texts[i], result) for i, result in enumerate(results) if result is not None]
+        self._store_cached(valid)
+        
+        if missing:
+            if allow_requery and not failed:
+                # Re-send only the missing ids, once, as a smaller batch
+                self._increment("requeried_items", len(missing))
+                retry_on_item = None
+                if on_item is not None:
+                    def retry_on_item(k, result):
+                        on_item(missing[k], result)
+                retry_results = self._request_batch(
+                    [texts[i] for i in missing], allow_requery=False, on_item=retry_on_item
+                )
+                for i, result in zip(missing, retry_results):
+                    results[i] = result
+            else:
+                self._fill_missing(texts, results, on_item)
+        
+        return results
+    
+    def _fill_missing(self, texts, results, on_item=None):
+        """Score every text without a result locally, reporting each to on_item"""
+        missing = [i for i, result in enumerate(results) if result is None]
+        fallback_results = self.fallback_batch([texts[i] for i in missing])
+        for i, result in zip(missing, fallback_results):
+            results[i] = result
+            if on_item is not None:
+                on_item(i, result)
+        return results
+    
+    def _emit_all(self, results, on_item):
+        """Report every result of a batch to on_item and return them"""
+        if on_item is not None:
+            for i, result in enumerate(results):
+                on_item(i, result)
+        return results
+    
+    def _build_batch_prompt(self, texts):
+        """Build the batch prompt for the configured wire protocol"""
+        if self.protocol == "compact":
+            return build_compact_prompt(texts)
+        
+        texts_json = json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)])
+        
+        prompt = f"""
+        Analyze the sentiment of these texts and return ONLY a JSON array:
+        
+        Texts: {texts_json}
+        
+        Return exactly this JSON format:
+        [
+            {{
+                "id": 0,
+                "sentiment": "positive" or "negative" or "neutral",
+                "confidence": confidence_score_0_to_1,
+                "emotions": ["relevant", "emotions"],
+                "key_phrases": ["important", "phrases"],
+                "intensity": intensity_score_1_to_10
+            }},
+            ...
+        ]
+        
+        Rules:
+        - Return analysis for each text with matching id
+        - sentiment must be exactly "positive", "negative", or "neutral"
+        - confidence must be between 0 and 1
+        - intensity must be between 1 and 10
+        """
+        
+        return prompt
+    
+    def _generate(self, prompt, expected_output_tokens=0):
+        """Call the model with rate limiting, retries and the circuit breaker"""
+        tokens = estimate_tokens(prompt) + expected_output_tokens
+        
+        def attempt():
+            # Queue here instead of failing on quota errors
+            self.rate_limiter.acquire(tokens)
+            if self.hedge_policy is None:
+                return self.backend.generate(prompt)
+            return self.hedge_policy.call(lambda: self.backend.generate(prompt), hedge)
+        
+        def hedge():
+            # The duplicate is a real request, so it spends rate budget too
+            self.rate_limiter.acquire(tokens)
+            return self.backend.generate(prompt)
+        
+        return self.circuit_breaker.call(lambda: self.retry_policy.call(attempt))
+    
+    def _generate_stream(self, prompt, on_element, expected_output_tokens=0):
+        """Stream the model answer, passing each completed array element to on_element"""
+        tokens = estimate_tokens(prompt) + expected_output_tokens
+        
+        def attempt():
+            self.rate_limiter.acquire(tokens)
+            if self.hedge_policy is None:
+                chunks = self.backend.generate_stream(prompt)
+            else:
+                # Hedged on time to first chunk; only the copy that starts first is read
+                chunks = self.hedge_policy.call_stream(lambda: self.backend.generate_stream(prompt), hedge)
+            
+            parser = IncrementalJSONParser(container="array")
+            received = []
+            for chunk in chunks:
+                received.append(chunk)
+                for element in parser.feed(chunk):
+                    on_element(self._decode_stream_element(element))
+            
+            if not parser.finished:
+                # No well-formed array streamed in; salvage what the full text still holds
+                for item in self._parse_batch_items("".join(received).strip()):
+                    on_element(item)
+        
+        def hedge():
+            self.rate_limiter.acquire(tokens)
+            return self.backend.generate_stream(prompt)
+        
+        # A retried attempt repeats items already delivered; callers ignore known ids
+        return self.circuit_breaker.call(lambda: self.retry_policy.call(attempt))
+    
+    def _decode_stream_element(self, element):
+        """Turn one streamed array element into a verbose result item"""
+        if self.protocol == "compact":
+            try:
+                return decode_compact_row(element)
+            except (ValueError, TypeError):
+                return None
+        return element
+    
+    def _probe_model(self):
+        """Send a tiny request to check whether the model is reachable again"""
+        prompt = "Reply with OK"
+        self.rate_limiter.acquire(estimate_tokens(prompt) + 1)
+        self.backend.generate(prompt)
+    
+    def _parse_batch_items(self, result_text):
+        """Extract result objects from a batch response, even a malformed one"""
+        if self.protocol == "compact":
+            return parse_compact_response(result_text)
+        
+        # Extract JSON array from response
+        json_match = re.search(r'\[.*\]', result_text, re.DOTALL)
+        if json_match:
+            try:
+                items = json.loads(json_match.group())
+                if isinstance(items, list):
+                    return items
+            except json.JSONDecodeError:
+                pass
+        
+        # Truncated or broken array: keep every object that still decodes
+        decoder = json.JSONDecoder()
+        items = []
+        position = result_text.find('{')
+        while position != -1:
+            try:
+                item, end = decoder.raw_decode(result_text, position)
+                items.append(item)
+                position = result_text.find('{', end)
+            except json.JSONDecodeError:
+                position = result_text.find('{', position + 1)
+        return items
+    
+    def _reconcile_batch_item(self, item, texts, results):
+        """Validate one item into results by its id and return that id, or None if unused"""
+        if not isinstance(item, dict):
+            return None
+        try:
+            item_id = int(item.get("id"))
+            if 0 <= item_id < len(texts) and results[item_id] is None:
+                results[item_id] = self.validate_result(item, texts[item_id])
+                return item_id
+        except (TypeError, ValueError, AttributeError):
+            # Unknown id or unusable fields: treat the item as missing
+            pass
+        return None
+    
+    def _lookup_cached(self, texts):
+        """Return cached results for texts, with None for every miss"""
+        if self.cache is None:
+            return [None] * len(texts)
+        
+        try:
+            cached = self.cache.get_many(texts, self.model_name, self.prompt_version)
+        except Exception as e:
+            print(f"Error reading result cache: {e}")
+            return [None] * len(texts)
+        
+        results = []
+        for text, result in zip(texts, cached):
+            if result is not None:
+                # The key is the normalized text, so show this caller's own copy
+                result["original_text"] = text[:100] + "..." if len(text) > 100 else text
+                result["tier"] = "cache"
+            results.append(result)
+        return results
+    
+    def _store_cached(self, items):
+        """Store validated (text, result) pairs in the cache"""
+        if self.cache is None:
+            return
+        
+        items = list(items)
+        try:
+            self.cache.put_many(items, self.model_name, self.prompt_version)
+            if self.near_duplicate_index is not None:
+                self.near_duplicate_index.add_many(items, self.model_name, self.prompt_version)
+        except Exception as e:
+            print(f"Error writing result cache: {e}")
+    
+    def _increment(self, name, amount=1):
+        """Increment a named counter"""
+        with self._counters_lock:
+            self._counters[name] += amount
+    
+    def get_stats(self):
+        """Return analyzer counters"""
+        with self._counters_lock:
+            stats = dict(self._counters)
+        stats["retries"] = self.retry_policy.retries
+        stats["circuit_breaker"] = self.circuit_breaker.get_stats()
+        if self.hedge_policy is not None:
+            stats["hedging"] = self.hedge_policy.get_stats()
+        stats["single_flight"] = self._in_flight.get_stats()
+        return stats
+    
+    def get_rate_limit_stats(self):
+        """Return rate limiter queueing statistics"""
+        return self.rate_limiter.get_stats()
+    
+    def get_backend_stats(self):
+        """Return backend counters, e.g. per-key load and health of a key pool"""
+        get_stats = getattr(self.backend, "get_stats", None)
+        return get_stats() if get_stats is not None else {}
+    
+    def get_packing_stats(self):
+        """Return batch packing statistics"""
+        return self.packer.get_stats()
+    
+    def get_near_duplicate_stats(self):
+        """Return near-duplicate reuse statistics"""
+        if self.near_duplicate_index is None:
+            return {}
+        return self.near_duplicate_index.get_stats()
+    
+    def get_cache_stats(self):
+        """Return result cache hit/miss counters"""
+        if self.cache is None:
+            return {}
+        return self.cache.get_stats()
     
     def validate_result(self, result, original_text):
         """Validate and clean analysis result"""
@@ -139,7 +754,8 @@ class SentimentAnalyzer:
             "key_phrases": result.get("key_phrases", []),
             "intensity": int(result.get("intensity", 5)),
             "original_text": original_text[:100] + "..." if len(original_text) > 100 else original_text,
-            "analyzed_at": datetime.now().isoformat()
+            "analyzed_at": datetime.now().isoformat(),
+            "tier": "llm"
         }
         
         # Validate sentiment values
@@ -156,56 +772,55 @@ class SentimentAnalyzer:
     
     def fallback_analysis(self, text):
         """Simple fallback analysis when AI fails"""
-        positive_words = ["good", "great", "excellent", "amazing", "love", "best", "wonderful", "fantastic"]
-        negative_words = ["bad", "terrible", "awful", "hate", "worst", "horrible", "disappointing"]
-        
-        text_lower = text.lower()
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        
-        if positive_count > negative_count:
-            sentiment = "positive"
-            confidence = 0.6
-        elif negative_count > positive_count:
-            sentiment = "negative"
-            confidence = 0.6
-        else:
-            sentiment = "neutral"
-            confidence = 0.5
-        
-        return {
-            "sentiment": sentiment,
-            "confidence": confidence,
-            "emotions": ["neutral"],
-            "key_phrases": [],
-            "intensity": 5,
-            "original_text": text[:100] + "..." if len(text) > 100 else text,
-            "analyzed_at": datetime.now().isoformat()
-        }
+        return self.fallback_batch([text])[0]
+    
+    def fallback_batch(self, texts):
+        """Score a whole batch locally in one vectorized pass"""
+        results, _ = self.lexicon_scorer.analyze(texts)
+        for result in results:
+            result["tier"] = "fallback"
+        return results
     
     def get_summary_stats(self, results):
         """Calculate summary statistics from analysis results"""
-        if not results:
+        accumulator = SummaryAccumulator()
+        accumulator.add_many(results)
+        return accumulator.summary()
+
+class SummaryAccumulator:
+    """Running version of get_summary_stats, fed one result at a time"""
+    
+    def __init__(self):
+        self.total = 0
+        self.sentiments = Counter()
+        self.emotions = Counter()
+        self.tiers = Counter()
+        self.confidence_sum = 0.0
+        self.intensity_sum = 0.0
+    
+    def add(self, result):
+        """Count one analysis result"""
+        self.total += 1
+        self.sentiments[result["sentiment"]] += 1
+        self.emotions.update(result["emotions"])
+        self.tiers[result.get("tier", "llm")] += 1
+        self.confidence_sum += result["confidence"]
+        self.intensity_sum += result["intensity"]
+    
+    def add_many(self, results):
+        """Count several analysis results"""
+        for result in results:
+            self.add(result)
+    
+    def summary(self):
+        """Return the same statistics get_summary_stats computes for a full list"""
+        total = self.total
+        if not total:
             return {}
         
-        total = len(results)
-        positive = sum(1 for r in results if r["sentiment"] == "positive")
-        negative = sum(1 for r in results if r["sentiment"] == "negative")
-        neutral = sum(1 for r in results if r["sentiment"] == "neutral")
-        
-        avg_confidence = sum(r["confidence"] for r in results) / total
-        avg_intensity = sum(r["intensity"] for r in results) / total
-        
-        # Get most common emotions
-        all_emotions = []
-        for r in results:
-            all_emotions.extend(r["emotions"])
-        
-        emotion_counts = {}
-        for emotion in all_emotions:
-            emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-        
-        top_emotions = sorted(emotion_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        positive = self.sentiments["positive"]
+        negative = self.sentiments["negative"]
+        neutral = self.sentiments["neutral"]
         
         return {
             "total_analyzed": total,
@@ -215,7 +830,10 @@ class SentimentAnalyzer:
             "positive_percentage": round((positive / total) * 100, 1),
             "negative_percentage": round((negative / total) * 100, 1),
             "neutral_percentage": round((neutral / total) * 100, 1),
-            "average_confidence": round(avg_confidence, 2),
-            "average_intensity": round(avg_intensity, 1),
-            "top_emotions": top_emotions
+            "average_confidence": round(self.confidence_sum / total, 2),
+            "average_intensity": round(self.intensity_sum / total, 1),
+            "top_emotions": self.emotions.most_common(5),
+            # Share of results served by each tier (cache, local, llm, fallback)
+            "tier_counts": dict(self.tiers),
+            "tier_percentages": {tier: round((count / total) * 100, 1) for tier, count in self.tiers.items()}
         }
@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import Future, InvalidStateError
+
+class SingleFlight:
+    """Share one in-flight call per key between every thread asking for it"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def claim_many(self, keys):
+        """Return a (future, is_leader) pair per key
+
+        The leader must resolve or fail its key; everyone else waits on the
+        same future.
+        """
+        claims = []
+        with self._lock:
+            for key in keys:
+                future = self._calls.get(key)
+                if future is None:
+                    future = self._calls[key] = Future()
+                    self.leaders += 1
+                    claims.append((future, True))
+                else:
+                    self.coalesced += 1
+                    claims.append((future, False))
+        return claims
+
+    def claim(self, key):
+        """Claim a single key"""
+        return self.claim_many([key])[0]
+
+    def resolve(self, key, result):
+        """Hand the result to every waiter and forget the key"""
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            try:
+                future.set_result(result)
+            except InvalidStateError:
+                pass
+
+    def resolve_many(self, pairs):
+        """Resolve several (key, result) pairs"""
+        for key, result in pairs:
+            self.resolve(key, result)
+
+    def fail_many(self, keys, error):
+        """Wake waiters of keys that are still in flight with an error"""
+        for key in keys:
+            with self._lock:
+                future = self._calls.pop(key, None)
+            if future is not None:
+                try:
+                    future.set_exception(error)
+                except InvalidStateError:
+                    pass
+
+    def get_stats(self):
+        """Return leader and coalesced call counts"""
+        with self._lock:
+            total = self.leaders + self.coalesced
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesce_rate": round(self.coalesced / total, 3) if total else 0.0
+            }
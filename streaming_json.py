@@ -0,0 +1,299 @@
+import json
+import re
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that change nesting or end a member; everything between them is skipped in one search
+_STRUCTURAL = re.compile(r'["\[\]{},]')
+# Characters that end a string or escape the next one
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+class IncrementalJSONParser:
+    """Parse a JSON array or object fed in chunks, yielding each member once complete
+
+    Array elements are yielded as parsed values and object members as
+    (key, value) pairs. Only the unfinished tail of the input is buffered,
+    so memory stays bounded by the largest single member.
+
+    Each member is decoded in place by json's C decoder. A member it cannot
+    decode, because the chunk cut it off or it is broken, is delimited by a
+    scanner that jumps between structural characters, then parsed on its own.
+
+    By default the top-level container is streamed. With `path`, a list of
+    object keys, the parser descends from the top-level object to the array
+    or object stored under those keys and streams that instead, skipping
+    everything else without parsing it.
+    """
+
+    def __init__(self, container=None, path=None):
+        # "array", "object" or None to accept whichever opens first
+        self.container = container
+        self.path = list(path or [])
+        self.kind = None
+        self.finished = False
+        self.elements = 0
+        self.skipped = 0
+
+        self._buffer = ""
+        self._position = 0
+        self._member_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        # True while the scanner is delimiting a member the decoder gave up on
+        self._scanning = False
+
+        # Descent state while looking for the container under `path`
+        self._matched = 0
+        self._string_start = None
+        self._last_string = None
+        self._key = None
+
+    def feed(self, chunk):
+        """Consume the next chunk of text and return the members it completed"""
+        if self.finished or not chunk:
+            return []
+
+        self._buffer += chunk
+        completed = []
+
+        if self.kind is None:
+            found = self._seek_path() if self.path else self._find_start()
+            if not found:
+                return completed
+
+        while not self.finished:
+            progressed = self._scan(completed) if self._scanning else self._decode_next(completed)
+            if not progressed:
+                break
+
+        if self.finished:
+            self._buffer = ""
+            self._position = self._member_start = 0
+            return completed
+
+        # Drop everything before the member being parsed
+        keep_from = self._member_start
+        self._buffer = self._buffer[keep_from:]
+        self._position -= keep_from
+        self._member_start = 0
+        return completed
+
+    def _decode_next(self, completed):
+        """Decode the member at _member_start, returning False when more input is needed"""
+        buffer = self._buffer
+        start = _WHITESPACE.match(buffer, self._member_start).end()
+        if start == len(buffer):
+            return False
+        if buffer[start] in "]}":
+            # Closes the container: it was empty or ended with a comma
+            self.finished = True
+            return True
+
+        try:
+            if self.kind == "array":
+                member, end = _DECODER.raw_decode(buffer, start)
+            else:
+                key, end = _DECODER.raw_decode(buffer, start)
+                end = _WHITESPACE.match(buffer, end).end()
+                if not isinstance(key, str) or buffer[end:end + 1] != ":":
+                    raise ValueError("Expected a key and a colon")
+                value, end = _DECODER.raw_decode(buffer, _WHITESPACE.match(buffer, end + 1).end())
+                member = (key, value)
+        except ValueError:
+            self._start_scan(start)
+            return True
+
+        end = _WHITESPACE.match(buffer, end).end()
+        if end == len(buffer):
+            # A number may go on in the next chunk, so wait for the delimiter
+            return False
+        if buffer[end] == ",":
+            self._member_start = end + 1
+        elif buffer[end] in "]}":
+            self.finished = True
+        else:
+            self._start_scan(start)
+            return True
+
+        completed.append(member)
+        self.elements += 1
+        return True
+
+    def _start_scan(self, start):
+        """Hand the member at start to the scanner"""
+        self._scanning = True
+        self._member_start = start
+        self._position = start
+        self._depth = 1
+        self._in_string = False
+        self._escaped = False
+
+    def _scan(self, completed):
+        """Find the end of the member being scanned, returning False when more input is needed"""
+        buffer = self._buffer
+        position = self._position
+        depth = self._depth
+        in_string = self._in_string
+        escaped = self._escaped
+        ended = False
+
+        while position < len(buffer):
+            if in_string:
+                if escaped:
+                    escaped = False
+                    position += 1
+                    continue
+                match = _STRING_SPECIAL.search(buffer, position)
+                if match is None:
+                    position = len(buffer)
+                    break
+                position = match.end()
+                if match.group() == "\\":
+                    escaped = True
+                else:
+                    in_string = False
+                continue
+
+            match = _STRUCTURAL.search(buffer, position)
+            if match is None:
+                position = len(buffer)
+                break
+            char = match.group()
+            position = match.end()
+            if char == '"':
+                in_string = True
+            elif char in "[{":
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+                if depth == 0:
+                    self._emit(buffer[self._member_start:position - 1], completed)
+                    self.finished = True
+                    ended = True
+                    break
+            elif depth == 1:
+                self._emit(buffer[self._member_start:position - 1], completed)
+                self._member_start = position
+                ended = True
+                break
+
+        self._position = position
+        self._depth = depth
+        self._in_string = in_string
+        self._escaped = escaped
+        if ended:
+            self._scanning = False
+        return ended
+
+    def _find_start(self):
+        """Skip leading text up to the opening bracket of the container"""
+        openers = {"array": "[", "object": "{"}
+        candidates = [openers[self.container]] if self.container else ["[", "{"]
+        indices = [self._buffer.find(opener) for opener in candidates]
+        indices = [index for index in indices if index != -1]
+        if not indices:
+            # Keep nothing; the opener has not arrived yet
+            self._buffer = ""
+            return False
+
+        return self._enter_container(min(indices))
+
+    def _enter_container(self, start):
+        """Start streaming the container whose opening bracket is at start"""
+        self.kind = "array" if self._buffer[start] == "[" else "object"
+        self._buffer = self._buffer[start + 1:]
+        self._position = 0
+        self._member_start = 0
+        self._depth = 1
+        self._in_string = False
+        self._escaped = False
+        self._scanning = False
+        return True
+
+    def _seek_path(self):
+        """Scan towards the container under self.path, returning True once it opens"""
+        buffer = self._buffer
+        position = self._position
+        depth = self._depth
+
+        while position < len(buffer):
+            char = buffer[position]
+            # Keys are only tracked inside the object currently being navigated
+            at_level = depth == self._matched + 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._string_start is not None:
+                        self._last_string = buffer[self._string_start:position]
+                        self._string_start = None
+            elif char.isspace():
+                pass
+            elif depth == 0:
+                if char == "{":
+                    depth = 1
+                elif char == "[":
+                    # Keys cannot lead into a top-level array
+                    self.finished = True
+                    return False
+            elif char == '"':
+                self._in_string = True
+                if at_level:
+                    self._string_start = position + 1
+            elif at_level and char == ":":
+                self._key = json.loads('"' + self._last_string + '"') if self._last_string is not None else None
+                self._last_string = None
+            elif at_level and self._key is not None and self._key == self.path[self._matched] and char in "[{":
+                self._key = None
+                if self._matched + 1 == len(self.path):
+                    self._buffer = buffer
+                    return self._enter_container(position)
+                if char == "[":
+                    # The path continues through an array, which keys cannot index
+                    self.finished = True
+                    return False
+                self._matched += 1
+                depth += 1
+            elif char in "[{":
+                if at_level:
+                    self._key = None
+                depth += 1
+            elif char in "]}":
+                depth -= 1
+                if depth < self._matched + 1:
+                    # Left the object being navigated without finding the key
+                    self.finished = True
+                    return False
+            elif at_level and char == ",":
+                self._key = None
+            position += 1
+
+        # Keep only a key that is still being read
+        if self._string_start is not None:
+            self._buffer = buffer[self._string_start:]
+            self._string_start = 0
+        else:
+            self._buffer = ""
+        self._position = len(self._buffer)
+        self._depth = depth
+        return False
+
+    def _emit(self, text, completed):
+        """Parse one member and add it to completed, skipping blanks and broken members"""
+        text = text.strip()
+        if not text:
+            return
+        try:
+            if self.kind == "array":
+                completed.append(json.loads(text))
+            else:
+                member = json.loads("{" + text + "}")
+                completed.extend(member.items())
+            self.elements += 1
+        except json.JSONDecodeError:
+            self.skipped += 1
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+from data_processor import DataProcessor
+from line_index import LineIndex
+
+LINES = [
+    "first review",
+    "",
+    "   ",
+    "  ",
+    "　",
+    "\t  ",
+    "café was great\r",
+    "   padded   ",
+    "日本語のレビュー",
+    "last line"
+]
+
+@pytest.mark.parametrize("block_bytes", [LineIndex.BLOCK_BYTES, 16])
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_lines_match_process_txt(block_bytes, trailing_newline):
+    data = "\n".join(LINES * 3).encode("utf-8") + (b"\n" if trailing_newline else b"")
+    expected = DataProcessor().process_txt(io.BytesIO(data))["texts"]
+
+    # Small blocks put line breaks at every position relative to a block edge
+    index_class = type("BlockIndex", (LineIndex,), {"BLOCK_BYTES": block_bytes})
+    with index_class.from_upload(io.BytesIO(data)) as index:
+        assert list(index) == expected
+        assert len(index) == len(expected)
+        assert index[-1] == expected[-1]
+
+def test_unicode_whitespace_lines_are_skipped():
+    with LineIndex.from_upload(io.BytesIO(b"x\n\xc2\xa0\xc2\xa0\ny")) as index:
+        assert list(index) == ["x", "y"]
+
+def test_byte_order_mark_is_skipped():
+    with LineIndex.from_upload(io.BytesIO(b"\xef\xbb\xbfhello\r\nworld\r\n")) as index:
+        assert list(index) == ["hello", "world"]
@@ -0,0 +1,243 @@
+"""Drive the analyzer through MockBackend, so the batch, retry and concurrency paths run offline"""
+import io
+import json
+import random
+import threading
+
+import pytest
+
+from backend_pool import BackendPool, PoolMember
+from data_processor import DataProcessor
+from model_backends import MockBackend
+from resilience import CircuitBreaker, RetryPolicy
+from sentiment_analyzer import SentimentAnalyzer
+from streaming_json import IncrementalJSONParser
+
+TEXTS = [
+    "I love this, it is great",
+    "This is the worst thing I ever bought",
+    "It arrived on Tuesday",
+    "Excellent quality and amazing support",
+    "Terrible packaging, it broke",
+    "The box is blue"
+] * 20
+
+# Distinct texts, so duplicate collapsing does not shrink the job to one batch
+NUMBERED_TEXTS = [f"{text} #{i}" for i, text in enumerate(TEXTS)]
+
+def make_analyzer(backend, **kwargs):
+    """Analyzer without a disk cache, rate limits or retry delays"""
+    kwargs.setdefault("retry_policy", RetryPolicy(base_delay=0.0))
+    return SentimentAnalyzer(
+        backend=backend, use_cache=False, requests_per_minute=100000, tokens_per_minute=10 ** 9, **kwargs
+    )
+
+def test_batch_results_line_up_with_inputs():
+    backend = MockBackend(seed=1)
+    results = make_analyzer(backend).analyze_batch(TEXTS)
+
+    assert [r["original_text"] for r in results] == TEXTS
+    assert [r["sentiment"] for r in results] == [backend.score(text)["sentiment"] for text in TEXTS]
+    assert {r["tier"] for r in results} == {"llm"}
+
+def test_broken_responses_are_salvaged_and_requeried():
+    texts = NUMBERED_TEXTS
+    backend = MockBackend(seed=2, malformed_rate=0.3, truncated_rate=0.3)
+    analyzer = make_analyzer(backend)
+    results = analyzer.analyze_batch(texts)
+
+    # Every answer is matched back to its own text by id, whatever arrived
+    assert [r["original_text"] for r in results] == texts
+    stats = analyzer.get_stats()
+    assert stats.get("requeried_items", 0) + stats.get("salvaged_items", 0) > 0
+    for text, result in zip(texts, results):
+        if result["tier"] == "llm":
+            assert result["sentiment"] == backend.score(text)["sentiment"]
+
+def test_transient_errors_are_retried():
+    backend = MockBackend(seed=3, error_rate=0.3)
+    analyzer = make_analyzer(backend)
+    results = analyzer.analyze_batch(NUMBERED_TEXTS)
+
+    assert len(results) == len(TEXTS)
+    assert backend.errors > 0
+    assert analyzer.get_stats()["retries"] > 0
+
+def test_circuit_breaker_opens_and_falls_back():
+    backend = MockBackend(seed=4, error_rate=1.0)
+    analyzer = make_analyzer(
+        backend,
+        retry_policy=RetryPolicy(max_attempts=1),
+        circuit_breaker=CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    )
+
+    results = analyzer.analyze_batch(NUMBERED_TEXTS)
+    assert {r["tier"] for r in results} == {"fallback"}
+    assert analyzer.get_stats()["circuit_breaker"]["state"] == "open"
+
+    # Once open, calls are refused without reaching the backend
+    calls = backend.calls
+    assert analyzer.analyze_single_text("Another great day")["tier"] == "fallback"
+    assert backend.calls == calls
+
+def test_single_texts_use_the_cascade():
+    backend = MockBackend(seed=7)
+    analyzer = make_analyzer(backend)
+    text = "Great, excellent, amazing, I love it"
+
+    assert analyzer.analyze_single_text(text, cascade_threshold=0.5)["tier"] == "local"
+    assert backend.calls == 0
+    assert analyzer.get_stats()["tier_local"] == 1
+
+    # Without the cascade the same text goes to the model
+    assert analyzer.analyze_single_text(text)["tier"] == "llm"
+    assert backend.calls == 1
+
+def test_streamed_results_arrive_once_each():
+    backend = MockBackend(seed=5)
+    analyzer = make_analyzer(backend)
+    seen = []
+    results = analyzer.analyze_batch(TEXTS, on_result=lambda index, result: seen.append((index, result)))
+
+    assert sorted(index for index, _ in seen) == list(range(len(TEXTS)))
+    assert all(result["sentiment"] == results[index]["sentiment"] for index, result in seen)
+
+def test_chunked_documents_share_repeated_pieces():
+    footer = "Thanks for reading this review, I hope it helps you decide."
+    documents = [f"{text}. {footer}" for text in TEXTS[:6]]
+    analyzer = make_analyzer(MockBackend(seed=6), chunk_chars=len(footer) + 1)
+    seen = []
+    results = analyzer.analyze_batch(documents, on_result=lambda index, result: seen.append(index))
+
+    assert [r["chunks"] for r in results] == [2] * len(documents)
+    assert sorted(seen) == list(range(len(documents)))
+    stats = analyzer.get_stats()
+    # The footer is sent once rather than coalesced with itself
+    assert stats["duplicates_collapsed"] == len(documents) - 1
+    assert "coalesced_requests" not in stats
+
+class StopScript(BaseException):
+    """Stand-in for the control-flow exceptions Streamlit raises to stop or rerun a script"""
+
+@pytest.mark.parametrize("error", [RuntimeError, StopScript])
+def test_errors_raised_by_on_result_propagate(error):
+    backend = MockBackend(seed=5)
+    analyzer = make_analyzer(backend)
+    calls = []
+
+    def on_result(index, result):
+        calls.append(index)
+        raise error("stop")
+
+    with pytest.raises(error):
+        analyzer.analyze_batch(NUMBERED_TEXTS, on_result=on_result)
+    # Nothing more is reported once on_result has failed
+    assert len(calls) == 1
+
+def test_concurrent_identical_requests_share_one_call():
+    backend = MockBackend(latency=0.3)
+    analyzer = make_analyzer(backend)
+    barrier = threading.Barrier(4)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(analyzer.analyze_single_text("What a wonderful morning"))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert backend.calls == 1
+    assert [r["sentiment"] for r in results] == ["positive"] * 4
+    assert analyzer.get_stats()["single_flight"]["coalesced"] == 3
+
+class QuotaExceededError(Exception):
+    code = 429
+
+class ExhaustedBackend(MockBackend):
+    """Mock whose quota is always used up"""
+
+    def generate(self, prompt):
+        raise QuotaExceededError("429 Quota exceeded")
+
+    def generate_stream(self, prompt, chunk_chars=64):
+        raise QuotaExceededError("429 Quota exceeded")
+        yield
+
+def test_pool_fails_over_from_an_exhausted_key():
+    members = [
+        PoolMember(ExhaustedBackend(), "exhausted", weight=10.0),
+        PoolMember(MockBackend(seed=6), "healthy")
+    ]
+    pool = BackendPool(members, cooldown=60)
+    analyzer = make_analyzer(pool)
+
+    results = analyzer.analyze_batch(TEXTS)
+    assert {r["tier"] for r in results} == {"llm"}
+    stats = analyzer.get_backend_stats()
+    assert stats["exhausted"]["quota_errors"] == 1
+    assert stats["exhausted"]["cooling_down_seconds"] > 0
+    assert stats["healthy"]["calls"] >= 1
+
+def feed_in_random_chunks(parser, text, rng):
+    members = []
+    position = 0
+    while position < len(text):
+        size = rng.randint(1, 16)
+        members.extend(parser.feed(text[position:position + size]))
+        position += size
+    return members
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_parser_matches_json_loads(seed):
+    rng = random.Random(seed)
+    document = [
+        {"id": i, "text": rng.choice(['plain', 'with "quotes"', 'brackets ] } , [', 'back\\slash', 'é ünï'])}
+        for i in range(50)
+    ] + ["a string", 12, None, [1, [2, {"x": "]"}]]]
+    text = json.dumps(document, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+
+    parser = IncrementalJSONParser()
+    assert feed_in_random_chunks(parser, text, rng) == document
+    assert parser.finished
+
+def test_incremental_parser_follows_a_path_and_skips_broken_members():
+    text = '{"meta": {"note": "[ignored]"}, "data": {"reviews": [1, {"bad": }, "ok", tru, 3]}}'
+    parser = IncrementalJSONParser(path=["data", "reviews"])
+
+    assert feed_in_random_chunks(parser, text, random.Random(0)) == [1, "ok", 3]
+    assert parser.skipped == 2
+    assert parser.finished
+
+class Upload:
+    """Minimal stand-in for a Streamlit upload"""
+
+    def __init__(self, data, name):
+        self._file = io.BytesIO(data)
+        self.name = name
+        self.size = len(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+@pytest.mark.parametrize("field_path", [None, "review.text", "*.review.text"])
+def test_streamed_json_matches_loading_it_whole(field_path):
+    document = [
+        {"id": i, "summary": f"summary of review {i}", "review": {"text": f"review number {i}"}}
+        for i in range(100)
+    ]
+    data = json.dumps(document).encode()
+    # Small reads make every member straddle a chunk boundary at some point
+    processor = DataProcessor()
+    processor.JSON_READ_BYTES = 7
+
+    streamed = list(processor.stream_json(Upload(data, "reviews.json"), field_path))
+    loaded = processor.process_json(Upload(data, "reviews.json"), field_path)["texts"]
+    assert streamed == loaded
+    assert len(loaded) == 100
@@ -0,0 +1,14 @@
+import pytest
+
+from rate_limiter import RateLimiter
+
+def test_sub_one_request_per_minute_still_admits_a_request():
+    limiter = RateLimiter(0.5, 1000)
+    assert limiter.acquire() == pytest.approx(0.0, abs=0.01)
+    # The next request would have to wait two minutes
+    assert limiter.estimated_wait() == pytest.approx(120, rel=0.01)
+
+@pytest.mark.parametrize("requests_per_minute, tokens_per_minute", [(0, 1000), (-1, 1000), (60, 0)])
+def test_non_positive_limits_are_rejected(requests_per_minute, tokens_per_minute):
+    with pytest.raises(ValueError):
+        RateLimiter(requests_per_minute, tokens_per_minute)
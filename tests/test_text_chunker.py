@@ -0,0 +1,60 @@
+import pytest
+
+from text_chunker import chunk_text, merge_chunk_results
+
+def make_result(sentiment, confidence, intensity=5, emotions=("neutral",), key_phrases=(), tier="llm"):
+    return {
+        "sentiment": sentiment,
+        "confidence": confidence,
+        "emotions": list(emotions),
+        "key_phrases": list(key_phrases),
+        "intensity": intensity,
+        "tier": tier
+    }
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("Fine. Really fine.", max_chars=100) == ["Fine. Really fine."]
+    assert chunk_text("   ", max_chars=100) == ["   "]
+
+def test_chunks_keep_sentences_whole_and_fit_the_limit():
+    sentences = [f"Sentence number {i} is here." for i in range(40)]
+    text = " ".join(sentences)
+    chunks = chunk_text(text, max_chars=120)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    # Joining the chunks gives back every sentence, in order and unbroken
+    assert " ".join(chunks) == text
+
+def test_long_sentences_are_cut_at_whitespace():
+    text = " ".join(["word"] * 100)
+    chunks = chunk_text(text, max_chars=42)
+
+    assert all(len(chunk) <= 42 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+def test_blank_lines_end_a_sentence():
+    assert chunk_text("no full stop here\n\nnext paragraph", max_chars=20) == [
+        "no full stop here", "next paragraph"
+    ]
+
+def test_merge_weighs_chunks_by_length_and_confidence():
+    results = [
+        make_result("positive", 0.9, intensity=8, emotions=["joy"], key_phrases=["great"]),
+        make_result("negative", 0.6, intensity=2, emotions=["anger"], key_phrases=["broke"], tier="local")
+    ]
+    merged = merge_chunk_results(results, [300, 100], "x" * 400)
+
+    assert merged["sentiment"] == "positive"
+    assert merged["confidence"] == pytest.approx(0.9 * 0.75 + 0.6 * 0.25, abs=0.01)
+    assert merged["intensity"] == 6
+    assert merged["emotions"] == ["joy", "anger"]
+    # Phrases of the longest chunk come first
+    assert merged["key_phrases"] == ["great", "broke"]
+    assert merged["tier"] == "llm"
+    assert merged["chunks"] == 2
+    assert merged["original_text"] == "x" * 100 + "..."
+
+def test_a_long_minority_chunk_can_outvote_short_ones():
+    results = [make_result("negative", 0.9), make_result("positive", 0.9), make_result("positive", 0.9)]
+    assert merge_chunk_results(results, [500, 100, 100], "text")["sentiment"] == "negative"
@@ -0,0 +1,75 @@
+import re
+from collections import Counter
+from datetime import datetime
+
+_SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+def split_sentences(text):
+    """Split text at sentence ends and blank lines"""
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY_RE.split(text) if sentence.strip()]
+
+def _split_long_sentence(sentence, max_chars):
+    """Break a sentence longer than max_chars at whitespace"""
+    pieces = []
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+def chunk_text(text, max_chars=1500):
+    """Split a document into pieces of at most max_chars, keeping sentences whole"""
+    chunks = []
+    current = ""
+    for sentence in split_sentences(text):
+        for piece in _split_long_sentence(sentence, max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks or [text]
+
+def merge_chunk_results(results, lengths, original_text):
+    """Combine per-chunk results into one document-level result"""
+    total = float(sum(lengths)) or 1.0
+    weights = [length / total for length in lengths]
+
+    # Each chunk votes for its sentiment with its length times its confidence
+    votes = Counter()
+    for result, weight in zip(results, weights):
+        votes[result["sentiment"]] += weight * result["confidence"]
+    sentiment = votes.most_common(1)[0][0]
+
+    emotion_weights = Counter()
+    for result, weight in zip(results, weights):
+        for emotion in result["emotions"]:
+            emotion_weights[emotion] += weight
+
+    key_phrases = []
+    for result in sorted(zip(results, weights), key=lambda pair: pair[1], reverse=True):
+        for phrase in result[0]["key_phrases"]:
+            if phrase not in key_phrases:
+                key_phrases.append(phrase)
+
+    tiers = Counter()
+    for result, weight in zip(results, weights):
+        tiers[result.get("tier", "llm")] += weight
+
+    return {
+        "sentiment": sentiment,
+        "confidence": round(sum(r["confidence"] * w for r, w in zip(results, weights)), 2),
+        "emotions": [emotion for emotion, _ in emotion_weights.most_common(5)],
+        "key_phrases": key_phrases[:5],
+        "intensity": max(1, min(10, int(round(sum(r["intensity"] * w for r, w in zip(results, weights)))))),
+        "original_text": original_text[:100] + "..." if len(original_text) > 100 else original_text,
+        "analyzed_at": datetime.now().isoformat(),
+        "tier": tiers.most_common(1)[0][0],
+        "chunks": len(results)
+    }
@@ -0,0 +1,47 @@
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def normalize_text(text):
+    """Normalize text so trivially different copies compare equal"""
+    text = unicodedata.normalize('NFKC', str(text))
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+def text_fingerprint(text, *parts):
+    """Return a stable hash of the normalized text plus any extra key parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\x00')
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+def collapse_duplicates(texts):
+    """Return the unique texts and, for every input row, the index of its unique text"""
+    unique_texts = []
+    positions = []
+    seen = {}
+    for text in texts:
+        key = normalize_text(text)
+        index = seen.get(key)
+        if index is None:
+            index = seen[key] = len(unique_texts)
+            unique_texts.append(text)
+        positions.append(index)
+    return unique_texts, positions
+
+def fan_out(unique_results, positions, texts):
+    """Expand results for unique texts back to one result per original row"""
+    results = []
+    used = set()
+    for text, index in zip(texts, positions):
+        result = unique_results[index]
+        if index in used:
+            # Each row gets its own copy, labelled with its own text
+            result = dict(result)
+            result["original_text"] = text[:100] + "..." if len(text) > 100 else text
+        used.add(index)
+        results.append(result)
+    return results
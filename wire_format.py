@@ -0,0 +1,95 @@
+import json
+
+# One-letter codes used by the compact protocol in both directions
+SENTIMENT_CODES = {"p": "positive", "n": "negative", "u": "neutral"}
+
+EMOTION_CODES = {
+    "h": "happy",
+    "s": "sad",
+    "a": "angry",
+    "x": "excited",
+    "f": "fear",
+    "r": "surprise",
+    "d": "disgust",
+    "t": "trust",
+    "g": "grateful",
+    "q": "frustrated",
+    "z": "disappointed",
+    "n": "neutral"
+}
+
+SENTIMENT_LETTERS = {name: code for code, name in SENTIMENT_CODES.items()}
+EMOTION_LETTERS = {name: code for code, name in EMOTION_CODES.items()}
+
+def build_compact_prompt(texts):
+    """Build a minimal batch prompt whose answer is a minified array of arrays"""
+    emotion_legend = " ".join(f"{code}={name}" for code, name in EMOTION_CODES.items())
+    texts_json = json.dumps(list(texts), ensure_ascii=False, separators=(",", ":"))
+    return (
+        "Sentiment of each text in T (id=index). Reply ONLY minified JSON [[id,s,c,i,e,k],...]\n"
+        "s:p=positive n=negative u=neutral c:confidence 0-100 i:intensity 1-10\n"
+        f"e:emotion codes {emotion_legend} k:1-3 key phrases joined by |\n"
+        f"T={texts_json}"
+    )
+
+def encode_compact_items(results):
+    """Encode verbose result dicts (with ids) as compact rows"""
+    rows = []
+    for result in results:
+        rows.append([
+            result["id"],
+            SENTIMENT_LETTERS.get(result["sentiment"], "u"),
+            int(round(float(result["confidence"]) * 100)),
+            int(result["intensity"]),
+            "".join(EMOTION_LETTERS[e] for e in result.get("emotions", []) if e in EMOTION_LETTERS),
+            "|".join(result.get("key_phrases", []))
+        ])
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+
+def decode_compact_row(row):
+    """Expand one compact row into the verbose item shape validate_result expects"""
+    if not isinstance(row, list) or len(row) < 4:
+        raise ValueError(f"Malformed compact row: {row!r}")
+    emotions = row[4] if len(row) > 4 else ""
+    key_phrases = row[5] if len(row) > 5 else ""
+    return {
+        "id": row[0],
+        "sentiment": SENTIMENT_CODES.get(str(row[1]), "neutral"),
+        # The prompt asks for a percentage
+        "confidence": float(row[2]) / 100,
+        "intensity": row[3],
+        "emotions": [EMOTION_CODES[code] for code in str(emotions) if code in EMOTION_CODES] or ["neutral"],
+        "key_phrases": [phrase for phrase in str(key_phrases).split("|") if phrase]
+    }
+
+def parse_compact_response(text):
+    """Decode a compact response, keeping every row that still parses"""
+    start = text.find("[")
+    if start == -1:
+        return []
+
+    try:
+        rows = json.loads(text[start:text.rfind("]") + 1])
+    except json.JSONDecodeError:
+        rows = None
+
+    if not isinstance(rows, list):
+        # Truncated or broken: decode inner rows one at a time
+        rows = []
+        decoder = json.JSONDecoder()
+        position = text.find("[", start + 1)
+        while position != -1:
+            try:
+                row, end = decoder.raw_decode(text, position)
+                rows.append(row)
+                position = text.find("[", end)
+            except json.JSONDecodeError:
+                position = text.find("[", position + 1)
+
+    items = []
+    for row in rows:
+        try:
+            items.append(decode_compact_row(row))
+        except (ValueError, TypeError):
+            continue
+    return items